@@ -0,0 +1,64 @@
+/*
+ * Clientside callbacks of the dashboard (see dashboard.register_callbacks).
+ * The text labels and the scale of the graph axes only depend on the inputs, so they are set in the browser without
+ * a round trip to the server. The graph figures are sent by the server to the graph_N_data stores and the scale
+ * toggles only change the axis types of a copy of them.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: (function () {
+
+        function withScale(axes) {
+            return function (figure, logarithmic) {
+                if (!figure) {
+                    return window.dash_clientside.no_update;
+                }
+                var layout = Object.assign({}, figure.layout);
+                axes.forEach(function (axis) {
+                    layout[axis] = Object.assign({}, layout[axis], {type: logarithmic ? 'log' : 'linear'});
+                });
+                return Object.assign({}, figure, {layout: layout});
+            };
+        }
+
+        return {
+            appName: function (dataSource, timeWindow) {
+                return 'SARS-CoV-2\n' + dataSource + ' (' + timeWindow + ')';
+            },
+
+            dataDescription: function (dataSource, timeFrame) {
+                var timeWindow = timeFrame === 'Weekly' ? 'week' : 'day';
+                return [
+                    'The interactive graph displayed to the right shows the trajectory of the number of new **' + dataSource + '** by',
+                    '*SARS-CoV-2* in the past ' + timeWindow + ' as a function of the total number of **' + dataSource + '**. If viewed with a',
+                    'weekly rate of change, the exponential behaviour is observed as a straight line and, in case the disease',
+                    'is being beaten, the curve with start to round off at the top and will start to travel with a downwards',
+                    'trend that will be visible as a sudden drop. Note that the graph is not plotted over time, but instead over',
+                    'the total number of **' + dataSource + '**, therefore, it plots the rate of change over the last ' + timeWindow + '. Time is',
+                    'shown in each data point with the corresponding day. Below the main figure, the data over time is also',
+                    'present. Hover over the graphs for more information. For more information concerning statistics and',
+                    'research about *COVID-19* please visit this [page](https://ourworldindata.org/coronavirus). Sources:',
+                    'Portugal data from [*Data Science for Social Good Portugal*](https://github.com/dssg-pt/covid19pt-data).',
+                    'Country level data from [*Our World in Data*](https://github.com/owid/covid-19-data/tree/master/public/data).',
+                    'Application\'s [source code](https://github.com/dvpinho/covid19dashboard).'
+                ].join('\n');
+            },
+
+            graph2Title: function (dataSource, timeFrame, timeWindow) {
+                if (timeFrame === 'Weekly') {
+                    return 'Average number of new ' + dataSource + ' per day in the previous week (' + timeWindow + ')';
+                }
+                return 'Cumulative ' + dataSource + ' (' + timeWindow + ')';
+            },
+
+            graph3Title: function (clickData) {
+                if (clickData) {
+                    return 'Confirmed cases in ' + clickData.points[0].hovertext;
+                }
+                return 'Click on a map region to show the confirmed cases over time';
+            },
+
+            logBothAxes: withScale(['xaxis', 'yaxis']),
+            logYAxis: withScale(['yaxis'])
+        };
+    })()
+});
@@ -0,0 +1,54 @@
+/*
+ * Decoding of the compact figure arrays sent by the callbacks (see encoding.py).
+ * The request hook asks for the compact encoding and the response hook turns every {dtype, bdata} object back into
+ * a typed array, or into 'YYYY-MM-DD' strings when it carries a date origin, before the figure is rendered.
+ */
+window.figureEncoding = (function () {
+    var ENCODING = 'b64';
+    var DAY = 24 * 60 * 60 * 1000;
+    var TYPED_ARRAYS = {
+        i4: Int32Array,
+        f4: Float32Array,
+        f8: Float64Array
+    };
+
+    function decodeArray(encoded) {
+        var binary = atob(encoded.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        var values = new TYPED_ARRAYS[encoded.dtype](bytes.buffer);
+        if (encoded.origin === undefined) {
+            return values;
+        }
+        var origin = Date.parse(encoded.origin);
+        var dates = new Array(values.length);
+        for (var j = 0; j < values.length; j++) {
+            dates[j] = new Date(origin + values[j] * DAY).toISOString().slice(0, 10);
+        }
+        return dates;
+    }
+
+    function decode(value) {
+        if (value === null || typeof value !== 'object') {
+            return value;
+        }
+        if (typeof value.bdata === 'string' && TYPED_ARRAYS[value.dtype]) {
+            return decodeArray(value);
+        }
+        Object.keys(value).forEach(function (key) {
+            value[key] = decode(value[key]);
+        });
+        return value;
+    }
+
+    return {
+        requestPre: function (payload) {
+            payload.encoding = ENCODING;
+        },
+        requestPost: function (payload, response) {
+            decode(response);
+        }
+    };
+})();
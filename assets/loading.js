@@ -0,0 +1,22 @@
+/*
+ * Reloads the loading page served while the data is loaded (see dashboard.loading_layout) once /readyz reports the
+ * data as loaded, so the full page and the scripts of its components are fetched.
+ */
+(function () {
+    var POLL_INTERVAL = 2000;
+
+    var timer = setInterval(function () {
+        if (!document.getElementById('loading_shell')) {
+            if (document.getElementById('panel_side')) {
+                clearInterval(timer);
+            }
+            return;
+        }
+        fetch('readyz').then(function (response) {
+            if (response.ok) {
+                clearInterval(timer);
+                window.location.reload();
+            }
+        });
+    }, POLL_INTERVAL);
+})();
@@ -0,0 +1,58 @@
+"""
+Microbenchmark of the map click lookup in display_click_data: the boolean scan over the whole OWID frame
+against the per-location slice index.
+
+    python benchmarks/click_latency.py path/to/owid-covid-data.csv [--repeat 20]
+"""
+import sys
+import time
+import argparse
+import pathlib
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import ingest  # noqa: E402
+
+
+def percentiles(timings):
+    timings = np.array(timings) * 1000
+    return f'p50 {np.percentile(timings, 50):7.3f} ms  p99 {np.percentile(timings, 99):7.3f} ms'
+
+
+def measure(lookup, locations, repeat):
+    timings = []
+    for _ in range(repeat):
+        for location in locations:
+            start = time.perf_counter()
+            lookup(location)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('csv_path')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    frame = ingest.load_owid(args.csv_path)
+    location_slices = {location: slice(start, stop)
+                       for location, (start, stop) in ingest.location_ranges(frame).items()}
+    locations = list(location_slices)
+
+    def scan(location):
+        cases_country = frame[frame['location'] == location]
+        return cases_country['date'], cases_country['total_cases']
+
+    def index(location):
+        cases_country = frame.iloc[location_slices.get(location, slice(0))]
+        return cases_country['date'], cases_country['total_cases']
+
+    print(f'{len(frame)} rows, {len(locations)} locations')
+    print(f"boolean scan: {percentiles(measure(scan, locations, args.repeat))}")
+    print(f"slice index:  {percentiles(measure(index, locations, args.repeat))}")
+
+
+if __name__ == '__main__':
+    main()
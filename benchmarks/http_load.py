@@ -0,0 +1,117 @@
+"""
+Load test of the page views of a running dashboard, reporting the bytes transferred per page view and requests/sec.
+A page view loads the index, the layout and the dependencies and then fires every callback with the initial values
+of its inputs, like the browser does. Run it against the same server before and after a change.
+
+    python benchmarks/http_load.py [--url http://127.0.0.1:8050] [--users 8] [--duration 30] [--no-compression]
+                                   [--revisit]
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+import requests
+
+
+def walk(node, props):
+    """Collect the props of every component with an id in the layout tree."""
+    if isinstance(node, list):
+        for child in node:
+            walk(child, props)
+    elif isinstance(node, dict) and 'props' in node:
+        if 'id' in node['props']:
+            props[node['props']['id']] = node['props']
+        walk(node['props'].get('children'), props)
+
+
+def callback_bodies(layout, dependencies):
+    props = {}
+    walk(layout, props)
+    bodies = []
+    for dependency in dependencies:
+        if dependency.get('clientside_function'):
+            continue
+        outputs = [output.split('.', 1) for output in dependency['output'].strip('.').split('...')]
+        outputs = [{'id': component, 'property': prop} for component, prop in outputs]
+        inputs = [dict(item, value=props.get(item['id'], {}).get(item['property'])) for item in dependency['inputs']]
+        state = [dict(item, value=props.get(item['id'], {}).get(item['property'])) for item in dependency['state']]
+        bodies.append({
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': inputs,
+            'state': state,
+            'changedPropIds': []
+        })
+    return bodies
+
+
+class PageView:
+
+    def __init__(self, url, compression, revisit):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'br, gzip' if compression else 'identity'
+        self.revisit = revisit
+        self.etags = {}
+        layout = self.session.get(f'{self.url}/_dash-layout').json()
+        dependencies = self.session.get(f'{self.url}/_dash-dependencies').json()
+        self.bodies = callback_bodies(layout, dependencies)
+
+    def request(self, method, path, **kwargs):
+        """Bytes received on the wire for one request, before decompression."""
+        # Every callback is a POST to the same path, so the ETags are kept per path and request body
+        key = (path, hashlib.sha1(json.dumps(kwargs.get('json'), sort_keys=True).encode('utf-8')).hexdigest())
+        headers = {'If-None-Match': self.etags[key]} if self.revisit and key in self.etags else {}
+        response = self.session.request(method, f'{self.url}{path}', headers=headers, stream=True, **kwargs)
+        size = len(response.raw.read(decode_content=False))
+        response.raise_for_status()
+        if 'ETag' in response.headers:
+            self.etags[key] = response.headers['ETag']
+        return size
+
+    def run(self):
+        """Bytes and number of requests of one page view."""
+        sizes = [self.request('GET', '/'), self.request('GET', '/_dash-layout'),
+                 self.request('GET', '/_dash-dependencies')]
+        sizes += [self.request('POST', '/_dash-update-component', json=body) for body in self.bodies]
+        return sum(sizes), len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--no-compression', action='store_true')
+    parser.add_argument('--revisit', action='store_true', help='revalidate with the ETags of the previous page view')
+    args = parser.parse_args()
+
+    totals = {'views': 0, 'requests': 0, 'bytes': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def user():
+        page_view = PageView(args.url, not args.no_compression, args.revisit)
+        while time.perf_counter() < deadline:
+            size, count = page_view.run()
+            with lock:
+                totals['views'] += 1
+                totals['requests'] += count
+                totals['bytes'] += size
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user) for _ in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{totals['views']} page views, {totals['requests']} requests in {elapsed:.1f}s with {args.users} users")
+    print(f"bytes per page view: {totals['bytes'] / max(totals['views'], 1):,.0f}")
+    print(f"page views/sec: {totals['views'] / elapsed:.1f}  requests/sec: {totals['requests'] / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
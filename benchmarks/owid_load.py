@@ -0,0 +1,64 @@
+"""
+Cold start benchmark of the OWID dataset load: the original `pd.read_csv` path against the streaming CSV ingestion
+and the Feather store.
+Every run happens in a fresh interpreter so the measured time and peak RSS include nothing but the load.
+
+    python benchmarks/owid_load.py path/to/owid-covid-data.csv [--runs 5]
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+LOADERS = {
+    'read_csv': 'frame = pd.read_csv(path, usecols=ingest.OWID_COLUMNS)',
+    'ingest_chunked': 'frame, latest = ingest.read_owid_csv(path)',
+    'feather': 'frame = ingest.load_owid(path)',
+    'feather_pruned': "frame = ingest.load_owid(path, columns=['location', 'date', 'total_cases'], "
+                      "locations=['Portugal'])",
+}
+
+CHILD = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+path = {path!r}
+start = time.perf_counter()
+import pandas as pd, ingest
+imported = time.perf_counter()
+{loader}
+loaded = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+max_rss_mb = rss / 1024 if sys.platform != 'darwin' else rss / 2 ** 20
+print(json.dumps({{'import_seconds': imported - start, 'seconds': loaded - imported, 'max_rss_mb': max_rss_mb,
+                  'rows': len(frame)}}))
+"""
+
+
+def run(loader, path):
+    code = CHILD.format(root=str(ROOT), path=str(path), loader=LOADERS[loader])
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('csv_path')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # The first Feather load pays for the conversion, which only happens once per snapshot
+    run('feather', args.csv_path)
+
+    for loader in LOADERS:
+        results = [run(loader, args.csv_path) for _ in range(args.runs)]
+        print(f"{loader:>15}: {statistics.median(r['seconds'] for r in results) * 1000:8.1f} ms load  "
+              f"{statistics.median(r['import_seconds'] for r in results) * 1000:8.1f} ms import  "
+              f"{statistics.median(r['max_rss_mb'] for r in results):8.1f} MB peak RSS  {results[0]['rows']} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+How startup, memory and the callbacks scale with the size of the data.
+Runs the benchmark suite (see suite.py) against synthetic sources of every combination of the given years and OWID
+locations (see fixtures.py), offline, and prints a row per size: the first data load, the peak memory after it, a
+reload and the median time of every server callback.
+
+    python benchmarks/scaling.py [--years 1 2 4] [--locations 50 250 1000] [--repeat 1] [--output scaling.json]
+"""
+import sys
+import json
+import argparse
+import itertools
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--locations', type=int, nargs='+', default=[50, 250, 1000])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    runs = []
+    for years, locations in itertools.product(args.years, args.locations):
+        results = suite.run(f'synthetic?years={years:g}&locations={locations}&seed={args.seed}', 10, args.repeat)
+        runs.append({'years': years, 'locations': locations, 'results': results})
+        callbacks = '  '.join(f"{output.split('.')[0]} {result['median_ms']:.1f}"
+                              for output, result in results['callbacks'].items())
+        startup = results['startup']
+        print(f"{years:5g} years {locations:6d} locations: first load {startup['first_load_seconds']:6.2f} s, "
+              f"{startup['max_rss_mb']:6.0f} MB, reload {results['load']['median_ms']:8.1f} ms, "
+              f"callbacks (ms) {callbacks}", flush=True)
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps({'commit': suite.commit(), 'runs': runs}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
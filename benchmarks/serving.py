@@ -0,0 +1,244 @@
+"""
+Load test of the gunicorn serving configurations, reporting the throughput and tail latency of each.
+Every configuration starts `gunicorn --config gunicorn.conf.py app:server` on a local port against offline sources
+(synthetic ones by default, see fixtures.py) and runs simulated users against it, locust style: each user loads the
+page and then repeats weighted tasks with a random wait in between. Changing the dropdowns requests the cheap graph
+callbacks, while clicking a country on the map and comparing a selection of countries request the heavy ones. With
+--cold the figure and response caches are disabled, so every heavy request builds its figure. The latencies are
+reported per request and for the fast and heavy groups, which shows whether fast callbacks queue behind slow ones.
+The client runs on the same machine as the server unless --url points to one started elsewhere.
+
+    python benchmarks/serving.py [--configurations sync gthread gevent] [--users 20] [--duration 30] [--workers 2]
+                                 [--threads 4] [--cold] [--fixtures 'synthetic?years=2&locations=250'] [--url URL]
+                                 [--output serving.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import pathlib
+import tempfile
+import threading
+import subprocess
+import numpy as np
+import requests
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import http_load  # noqa: E402
+import suite  # noqa: E402
+import dashboard  # noqa: E402
+
+# Environment of every configuration, on top of the --workers and --threads given
+CONFIGURATIONS = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread'},
+    'gevent': {'GUNICORN_WORKER_CLASS': 'gevent'}
+}
+
+HEAVY = {'graph_3_data', 'graph_4'}
+
+
+def task(weight):
+    def decorate(function):
+        function.weight = weight
+        return function
+    return decorate
+
+
+class DashboardUser:
+    """A visitor of the dashboard, recording the latency of every request it makes."""
+
+    def __init__(self, url, bodies, locations, metrics, record):
+        self.url = url
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'br, gzip'
+        self.bodies = {body['output'].split('.')[0]: body for body in bodies}
+        self.locations = locations
+        self.metrics = metrics
+        self.record = record
+        self.tasks = [getattr(self, name) for name in dir(self) if hasattr(getattr(self, name), 'weight')]
+        self.weights = [function.weight for function in self.tasks]
+
+    def request(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.url}{path}', timeout=60, **kwargs)
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            ok = False
+        self.record(name, time.perf_counter() - start, ok)
+
+    def callback(self, output, **values):
+        body = dict(self.bodies[output])
+        body['inputs'] = [dict(item, value=values.get(item['id'], item['value'])) for item in body['inputs']]
+        body['changedPropIds'] = [f"{item['id']}.{item['property']}" for item in body['inputs'] if item['id'] in values]
+        self.request(output, 'POST', '/_dash-update-component', json=body)
+
+    @task(1)
+    def page_view(self):
+        self.request('index', 'GET', '/')
+        self.request('layout', 'GET', '/_dash-layout')
+        self.request('dependencies', 'GET', '/_dash-dependencies')
+
+    @task(6)
+    def change_dropdowns(self):
+        values = {'data_dropdown_component': random.choice(dashboard.DATA_SOURCES),
+                  'time_dropdown_component': random.choice(dashboard.TIME_FRAMES),
+                  'time_window_dropdown_component': random.choice(dashboard.TIME_WINDOWS)}
+        self.callback('graph_1_data', **values)
+        self.callback('graph_2_data', **values)
+
+    @task(3)
+    def click_country(self):
+        self.callback('graph_3_data', world_map={'points': [{'hovertext': random.choice(self.locations)}]})
+
+    @task(2)
+    def compare_countries(self):
+        points = [{'hovertext': location} for location in random.sample(self.locations, random.randint(2, 8))]
+        self.callback('graph_4', world_map={'points': points}, comparison_metric_dropdown=random.choice(self.metrics))
+
+    def run(self, deadline, wait):
+        self.page_view()
+        while time.perf_counter() < deadline:
+            random.choices(self.tasks, self.weights)[0]()
+            time.sleep(random.uniform(*wait))
+
+
+def page(url):
+    """Callback bodies with the initial values of the inputs, the locations of the map and the comparison metrics."""
+    layout = requests.get(f'{url}/_dash-layout').json()
+    dependencies = requests.get(f'{url}/_dash-dependencies').json()
+    props = {}
+    http_load.walk(layout, props)
+    return (http_load.callback_bodies(layout, dependencies), props['world_map']['figure']['data'][0]['hovertext'],
+            [option['value'] for option in props['comparison_metric_dropdown']['options']])
+
+
+def percentiles(timings):
+    count = len(timings)
+    timings = np.array(timings or [np.nan]) * 1000
+    return {'count': count, 'p50_ms': np.percentile(timings, 50), 'p95_ms': np.percentile(timings, 95),
+            'p99_ms': np.percentile(timings, 99), 'max_ms': timings.max()}
+
+
+def load_test(url, users, duration, wait):
+    bodies, locations, metrics = page(url)
+    timings, errors = {}, {}
+    lock = threading.Lock()
+
+    def record(name, seconds, ok):
+        with lock:
+            timings.setdefault(name, []).append(seconds)
+            errors[name] = errors.get(name, 0) + (not ok)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    users = [DashboardUser(url, bodies, locations, metrics, record) for _ in range(users)]
+    threads = [threading.Thread(target=user.run, args=(deadline, wait)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    groups = {'fast': [t for name, values in timings.items() if name not in HEAVY for t in values],
+              'heavy': [t for name, values in timings.items() if name in HEAVY for t in values]}
+    return {
+        'requests_per_second': sum(map(len, timings.values())) / elapsed,
+        'errors': sum(errors.values()),
+        'groups': {name: percentiles(values) for name, values in groups.items()},
+        'requests': {name: dict(percentiles(values), errors=errors[name]) for name, values in sorted(timings.items())}
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, server, timeout=300):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+        try:
+            if requests.get(f'{url}/readyz', timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{url} was not ready after {timeout}s')
+
+
+def serve_and_test(configuration, args, fixtures):
+    env = {variable: value for variable, value in os.environ.items() if variable not in suite.SOURCE_VARIABLES}
+    env.update(DATA_SOURCE=fixtures, DATA_REFRESH_INTERVAL='0', WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads))
+    env.update(CONFIGURATIONS[configuration])
+    if args.cold:
+        env.update(FIGURE_CACHE_SIZE='0', HTTP_CACHE_BYTES='0')
+
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env['DATA_CACHE_DIR'] = cache_dir
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+                                   '--bind', f'127.0.0.1:{port}', 'app:server'], env=env, cwd=ROOT,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(url, server)
+            return load_test(url, args.users, args.duration, args.wait)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def report(name, results):
+    groups = '  '.join(f"{group} p50 {result['p50_ms']:7.1f} p95 {result['p95_ms']:7.1f} p99 {result['p99_ms']:7.1f} ms"
+                       for group, result in results['groups'].items())
+    print(f"{name:>14}: {results['requests_per_second']:7.1f} req/s  {results['errors']} errors  {groups}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--configurations', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--wait', type=float, nargs=2, default=[0.1, 0.5], metavar=('MIN', 'MAX'),
+                        help='seconds a user waits between tasks')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--cold', action='store_true', help='disable the figure and response caches')
+    parser.add_argument('--fixtures', default='synthetic?years=2&locations=250',
+                        help="folder with the four CSV files or a synthetic source")
+    parser.add_argument('--url', help='load test a running server instead of starting the configurations')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    if args.url:
+        results['url'] = load_test(args.url.rstrip('/'), args.users, args.duration, args.wait)
+        report(args.url, results['url'])
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Generated once and shared by the configurations, so their startup does not include it
+            fixtures = args.fixtures
+            if fixtures.startswith('synthetic'):
+                fixtures = suite.synthetic_fixtures(fixtures, pathlib.Path(temp_dir, 'fixtures'))
+            for configuration in args.configurations:
+                results[configuration] = serve_and_test(configuration, args, str(pathlib.Path(fixtures).resolve()))
+                report(configuration, results[configuration])
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps({'commit': suite.commit(), 'arguments': vars(args),
+                                                         'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
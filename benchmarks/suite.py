@@ -0,0 +1,218 @@
+"""
+Offline benchmark suite of the dashboard: startup, every callback over its input grid and the layout serialization.
+The app runs in a fresh interpreter against local copies of the sources (data.csv, amostras.csv, vacinas.csv and
+owid-covid-data.csv in the FIXTURES folder), or synthetic ones generated beforehand when FIXTURES is e.g.
+'synthetic?years=3&locations=500' (see fixtures.py), with an empty snapshot cache. Callbacks are dispatched through
+the Flask test client with the figure and response caches cleared before every request, so the timings include the
+callback, the serialization and the compression of its response. Results are written as JSON; with --compare the
+timings are checked against an earlier run and the suite fails when one of them regressed by more than --threshold.
+
+    python benchmarks/suite.py FIXTURES [--output results.json] [--compare baseline.json] [--repeat 3] [--locations 10]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import pathlib
+import resource
+import statistics
+import subprocess
+import tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SOURCE_VARIABLES = ('DSSG_DATA_URL', 'DSSG_SAMPLES_URL', 'DSSG_VACCINES_URL', 'OWID_DATA_URL')
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 1024
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return {
+        'count': len(timings),
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[min(int(len(timings) * 0.95), len(timings) - 1)] * 1000,
+        'total_ms': sum(timings) * 1000
+    }
+
+
+def input_grid(dependency, locations):
+    """Every combination of the values the inputs of a callback can take."""
+    import dashboard
+    points = [{'points': [{'hovertext': location}]} for location in locations]
+    values = {
+        'data_dropdown_component.value': dashboard.DATA_SOURCES,
+        'time_dropdown_component.value': dashboard.TIME_FRAMES,
+        'time_window_dropdown_component.value': dashboard.TIME_WINDOWS,
+        'world_map.clickData': points,
+        'world_map.hoverData': points,
+        'world_map.selectedData': [{'points': [point for item in points for point in item['points']]}],
+        'comparison_metric_dropdown.value': list(dashboard.COMPARISON_METRICS),
+        'date_range_component.start_date': [None],
+        'date_range_component.end_date': [None]
+    }
+    inputs = dependency['inputs']
+    domains = [values.get(f"{item['id']}.{item['property']}", [True, False]) for item in inputs]
+    for combination in itertools.product(*domains):
+        yield [dict(item, value=value) for item, value in zip(inputs, combination)]
+
+
+def measure_callbacks(application, client, locations, repeat):
+    results = {}
+    for dependency in client.get('/_dash-dependencies').get_json():
+        if dependency.get('clientside_function'):
+            continue
+        output = dependency['output']
+        timings, sizes = [], []
+        for inputs in input_grid(dependency, locations):
+            body = {'output': output, 'outputs': dict(zip(('id', 'property'), output.split('.', 1))),
+                    'inputs': inputs, 'state': [], 'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"]}
+            for _ in range(repeat):
+                application.figure_cache.figures.clear()
+                application.response_cache.clear()
+                start = time.perf_counter()
+                response = client.post('/_dash-update-component', json=body, headers={'Accept-Encoding': 'gzip'})
+                timings.append(time.perf_counter() - start)
+            sizes.append(len(response.data))
+        results[output] = dict(summary(timings), payload_bytes=statistics.median(sizes))
+    return results
+
+
+def child(locations, repeat):
+    """Run in the fresh interpreter started by main, prints the results as JSON."""
+    start = time.perf_counter()
+    import app
+    application = app.create_app()
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app.load()
+    first_load_seconds = time.perf_counter() - start
+    rss_after_load = max_rss_mb()
+
+    import dataset
+    import dashboard
+    import plotly
+    load_timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dataset.load_dataset()
+        load_timings.append(time.perf_counter() - start)
+
+    ds = dataset.current()
+    locations = sorted(ds.location_slices)[:locations]
+    client = application.server.test_client()
+    callbacks = measure_callbacks(application, client, locations, repeat)
+
+    layout_timings, layout_sizes = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        layout = json.dumps(dashboard.serve_layout(), cls=plotly.utils.PlotlyJSONEncoder)
+        layout_timings.append(time.perf_counter() - start)
+        layout_sizes.append(len(layout))
+
+    return {
+        'startup': {'import_seconds': import_seconds, 'first_load_seconds': first_load_seconds,
+                    'max_rss_mb': rss_after_load},
+        'load': summary(load_timings),
+        'callbacks': callbacks,
+        'layout': dict(summary(layout_timings), payload_bytes=layout_sizes[0]),
+        'max_rss_mb': max_rss_mb()
+    }
+
+
+def synthetic_fixtures(source, folder):
+    """Write the four files of a 'synthetic?...' data source into `folder`."""
+    import fixtures
+    _, _, query = source.partition('?')
+    folder.mkdir()
+    for name in fixtures.WRITERS:
+        fixtures.write_url(f'synthetic:{name}?{query}', folder.joinpath(name))
+    return folder
+
+
+def run(fixtures, locations, repeat):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Synthetic sources are generated before the app starts, so the timings do not include them
+        if fixtures.startswith('synthetic'):
+            fixtures = synthetic_fixtures(fixtures, pathlib.Path(temp_dir, 'fixtures'))
+        env = {variable: value for variable, value in os.environ.items() if variable not in SOURCE_VARIABLES}
+        env.update(DATA_SOURCE=str(pathlib.Path(fixtures).resolve()),
+                   DATA_CACHE_DIR=str(pathlib.Path(temp_dir, 'cache')), DATA_REFRESH_INTERVAL='0')
+        output = subprocess.run([sys.executable, __file__, str(fixtures), '--child', '--locations', str(locations),
+                                 '--repeat', str(repeat)], env=env, cwd=ROOT, check=True, capture_output=True,
+                                text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timings(results):
+    """Flat name -> milliseconds of the timed sections of a result set."""
+    flat = {'startup.import': results['startup']['import_seconds'] * 1000, 'load': results['load']['median_ms'],
+            'layout': results['layout']['median_ms']}
+    if 'first_load_seconds' in results['startup']:
+        flat['startup.first_load'] = results['startup']['first_load_seconds'] * 1000
+    flat.update({f'callback.{output}': result['median_ms'] for output, result in results['callbacks'].items()})
+    return flat
+
+
+def compare(baseline, results, threshold):
+    """Print the change of every timing and return the names of the ones that regressed."""
+    regressions = []
+    before, after = timings(baseline['results']), timings(results['results'])
+    for name in sorted(after):
+        if name not in before:
+            print(f'{name:>55}: {after[name]:9.2f} ms  (new)')
+            continue
+        ratio = after[name] / before[name] if before[name] else float('inf')
+        flag = ' REGRESSION' if ratio > 1 + threshold else ''
+        print(f'{name:>55}: {before[name]:9.2f} -> {after[name]:9.2f} ms  x{ratio:.2f}{flag}')
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('fixtures')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--locations', type=int, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.locations, args.repeat)))
+        return
+
+    results = {'commit': commit(), 'python': sys.version.split()[0], 'repeat': args.repeat,
+               'locations': args.locations, 'results': run(args.fixtures, args.locations, args.repeat)}
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare(json.loads(pathlib.Path(args.compare).read_text()), results, args.threshold)
+        if regressions:
+            sys.exit(f'{len(regressions)} timings regressed by more than {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
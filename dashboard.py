@@ -0,0 +1,837 @@
+"""
+Layout, figures and callbacks of the dashboard.
+The layout and the callbacks read the snapshot in use from `dataset.current()`. Until the first snapshot is
+published `serve_layout` returns a lightweight loading page. plotly.express and dash_daq are only imported when the
+first map figure and the first full page are built.
+"""
+import os
+import json
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+from dash.dependencies import ClientsideFunction, Input, Output
+from dash.exceptions import PreventUpdate
+import numpy as np
+import dataset
+import downsample
+import windowing
+import encoding
+
+
+covid_data_columns = ['location', 'date', 'total_cases', 'new_cases', 'total_deaths',
+                      'new_deaths', 'new_tests', 'total_vaccinations',
+                      'people_vaccinated', 'people_fully_vaccinated', 'new_vaccinations']
+
+DATA_SOURCES = ['Confirmed Cases', 'Recovered Cases', 'Reported Deaths']
+TIME_FRAMES = ['Weekly', 'Daily']
+TIME_WINDOWS = list(windowing.PRESETS) + [windowing.CUSTOM]
+# Metrics of the countries compared in graph_4, keys of the Dataset.location_matrix
+COMPARISON_METRICS = {
+    'New cases per million (7-day average)': ('new_cases', 'mean_7'),
+    'New cases per million (14-day average)': ('new_cases', 'mean_14'),
+    'New deaths per million (7-day average)': ('new_deaths', 'mean_7'),
+    'New deaths per million (14-day average)': ('new_deaths', 'mean_14'),
+    'New vaccinations per million (7-day average)': ('new_vaccinations', 'mean_7'),
+    'New vaccinations per million (14-day average)': ('new_vaccinations', 'mean_14'),
+    'Daily growth of new cases (%, 7-day average)': ('new_cases', 'mean_7_growth'),
+    'Daily growth of new deaths (%, 7-day average)': ('new_deaths', 'mean_7_growth'),
+    'Case fatality rate (%)': ('case_fatality_rate', 'lagged')
+}
+
+data_dropdown = dcc.Dropdown(
+    id="data_dropdown_component",
+    options=[{'label': i, 'value': i} for i in DATA_SOURCES],
+    clearable=False,
+    searchable=False,
+    value="Confirmed Cases"
+)
+
+time_dropdown = dcc.Dropdown(
+    id="time_dropdown_component",
+    options=[{'label': i, 'value': i} for i in TIME_FRAMES],
+    clearable=False,
+    searchable=False,
+    value="Weekly"
+)
+
+time_window_dropdown = dcc.Dropdown(
+    id="time_window_dropdown_component",
+    options=[{'label': i, 'value': i} for i in TIME_WINDOWS],
+    clearable=False,
+    searchable=False,
+    value="All Data"
+)
+
+app_title = html.P(id="app_title", children=["COVID-19", html.Br(), "Portugal Dashboard"])
+app_dropdown_text = html.H1(id="app_dropdown_text", children="")
+app_body = html.P(className="app_body", id="app_body", children=[dcc.Markdown(id="app_body_text")])
+
+
+def date_range_picker(ds):
+    # Applies to the graphs when the 'Custom Range' time window is selected
+    return dcc.DatePickerRange(
+        id="date_range_component",
+        min_date_allowed=ds.dates[0].item(),
+        max_date_allowed=ds.dates[-1].item(),
+        start_date=ds.dates[0].item(),
+        end_date=ds.dates[-1].item(),
+        display_format='DD-MM-YYYY'
+    )
+
+
+def side_panel_layout(ds):
+    return html.Div(
+        id="panel_side",
+        children=[
+            app_title,
+            html.P(id="update_date", children=[f"Status as of {ds.dates[-1]}"]),
+            html.Div(id="info_dropdown",
+                     children=[data_dropdown, time_dropdown, time_window_dropdown, date_range_picker(ds)]),
+            html.Div(id="panel_side_text",
+                     children=[app_dropdown_text, app_body])
+        ]
+    )
+
+
+def scale_toggle(component_id, value):
+    # dash_daq is only imported once a full page is built, which keeps it out of the startup path
+    import dash_daq as daq
+    return daq.ToggleSwitch(
+        id=component_id,
+        value=value,
+        label=["Linear", "Logarithmic"],
+        color="#ffe102",
+        style={"color": "#black"}
+    )
+
+
+figure_1_layout = {
+    "showlegend": False,
+    "autosize": True,
+    "paper_bgcolor": "#1e1e1e",
+    "plot_bgcolor": "#1e1e1e",
+    "margin": {"t": 0, "r": 0, "b": 0, "l": 0}
+}
+
+
+def graph_1_layout():
+    return html.Div(
+        id="graph_1_wrapper",
+        children=[
+            scale_toggle("graph_1_scale_toggle", True),
+            dcc.Graph(
+                id="graph_1",
+                figure={"layout": figure_1_layout},
+                config={"displayModeBar": False, "scrollZoom": False}
+            ),
+            dcc.Store(id="graph_1_data")
+        ]
+    )
+
+
+def graph_2_layout():
+    return html.Div(
+        id="graph_2_container",
+        children=[
+            html.Div(
+                id="graph_2_header",
+                children=[
+                    html.H1(
+                        id="graph_2_title", children=[""]
+                    ),
+                    scale_toggle("graph_2_scale_toggle", False)
+                ]
+            ),
+            dcc.Graph(
+                id="graph_2",
+                config={"displayModeBar": False}
+            ),
+            dcc.Store(id="graph_2_data")
+        ]
+    )
+
+
+# Map graph
+color_scale = ['#FFFAFA', '#F4C2C2', '#FF6961', '#FF5C5C', '#FF1C00', '#FF0800', '#FF0000', '#CD5C5C', '#E34234',
+               '#D73B3E', '#CE1620', '#CC0000', '#B22222', '#B31B1B', '#A40000', '#800000', '#701C1C', '#321414']
+
+
+MAPBOX_ACCESS_TOKEN = os.environ.get('MAPBOX_ACCESS_TOKEN')
+
+
+def round_float32(values):
+    # Shortest decimals that round-trip in float32, which keeps the serialized map short
+    return np.asarray(values, dtype='float32').astype(str).astype('float64')
+
+
+def build_map_figure(countries):
+    """
+    Map figure of the snapshot, serialized once and kept as plain JSON types.
+    Only the location and its total cases are shipped, the rest of the detail is loaded on hover or click.
+    """
+    import plotly.express as px
+
+    countries = countries[['location', 'latitude', 'longitude', 'total_cases']].copy()
+    for column in ('latitude', 'longitude', 'total_cases'):
+        countries[column] = round_float32(countries[column])
+
+    fig = px.scatter_mapbox(countries, lat="latitude", lon="longitude", hover_name="location",
+                            size='total_cases', size_max=175, color='total_cases',
+                            color_continuous_scale=color_scale,
+                            hover_data={'latitude': False, 'longitude': False, 'total_cases': ':,.0f'})
+    # The hover template reads the marker color, the columns px copies into customdata are not needed
+    fig.update_traces(customdata=None)
+
+    fig.update_layout(
+        autosize=True,
+        hovermode='closest',
+        showlegend=False,
+        coloraxis_showscale=False,
+        clickmode='event+select',
+        margin={'b': 0, 'l': 0, 'r': 0, 't': 0},
+        mapbox=dict(
+            accesstoken=MAPBOX_ACCESS_TOKEN,
+            center=dict(
+                lat=51.16,
+                lon=10.45
+            ),
+            zoom=3,
+            style='dark'
+        )
+    )
+    return json.loads(fig.to_json())
+
+
+def graph_3_layout():
+    return html.Div(
+        id="graph_3_container",
+        children=[
+            html.Div(
+                id="graph_3_header",
+                children=[
+                    html.H1(
+                        id="graph_3_title", children=[""]
+                    ),
+                    scale_toggle("graph_3_scale_toggle", False)
+                ]
+            ),
+            dcc.Graph(
+                id="graph_3",
+                figure={"layout": {
+                    "showlegend": False,
+                    "autosize": True,
+                    "paper_bgcolor": "#2b2b2b",
+                    "plot_bgcolor": "2b2b2b",
+                }},
+                config={"displayModeBar": False}
+            ),
+            dcc.Store(id="graph_3_data")
+        ]
+    )
+
+
+def graph_4_layout():
+    return html.Div(
+        id="graph_4_container",
+        children=[
+            html.Div(
+                id="graph_4_header",
+                children=[
+                    html.H1(
+                        id="graph_4_title",
+                        children=["Shift+click map regions to compare them"]
+                    ),
+                    dcc.Dropdown(
+                        id="comparison_metric_dropdown",
+                        options=[{'label': i, 'value': i} for i in COMPARISON_METRICS],
+                        clearable=False,
+                        searchable=False,
+                        value="New cases per million (7-day average)"
+                    )
+                ]
+            ),
+            dcc.Graph(
+                id="graph_4",
+                figure=placeholder_figure(),
+                config={"displayModeBar": False}
+            )
+        ]
+    )
+
+
+def main_panel_layout(ds):
+    return html.Div(
+        id="panel_upper_lower",
+        children=[
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H6(f'{ds.prt_confirmed:,}'.replace(',', ' '), style={'color': '#e0f7fa'}),
+                            dcc.Markdown(f"*+{ds.prt_confirmed_daily}*",
+                                         style={'color': '#e0f7fa'}),
+                            html.P(children=["Confirmed Cases", html.Br(), "Portugal"])
+                        ],
+                        id="confirmed_cases_prt",
+                        className="container_confirmed_cases",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.prt_deaths:,}'.replace(',', ' '), style={'color': '#f44336'}),
+                            dcc.Markdown(f"*+{ds.prt_deaths_daily}*",
+                                         style={'color': '#f44336'}),
+                            html.P(children=["Reported Deaths", html.Br(), "Portugal"])
+                        ],
+                        id="reported_deaths_prt",
+                        className="container_reported_deaths",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.prt_recovered:,}'.replace(',', ' '), style={'color': '#66bb6a'}),
+                            dcc.Markdown(f"*+{ds.prt_recovered_daily}*",
+                                         style={'color': '#66bb6a'}),
+                            html.P(children=["Recovered Cases", html.Br(), "Portugal"])
+                        ],
+                        id="recovered_cases_prt",
+                        className="container_recovered_cases",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.active_cases:,}'.replace(',', ' '), style={'color': '#FFA500'}),
+                            dcc.Markdown(f'*+{ds.active_cases_daily}*' if ds.active_cases_daily > 0 else f'*{ds.active_cases_daily}*',
+                                         style={'color': '#FFA500'}),
+                            html.P(children=["Active Cases", html.Br(), "Portugal"])
+                        ],
+                        id="active_cases_prt",
+                        className="container_active_cases",
+                    )
+                ],
+                className="row container-display",
+            ),
+            graph_1_layout(),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H6(f'{int(ds.hospitalized)}', style={'color': '#FFA500'}),
+                            dcc.Markdown(f'*+{int(ds.hospitalized_daily)}*' if ds.hospitalized_daily > 0 else f'*{int(ds.hospitalized_daily)}*',
+                                         style={'color': '#FFA500'}),
+                            html.P(children=["Hospitalized Cases", html.Br(), "Portugal"])
+                        ],
+                        id="hospitalized_cases_prt",
+                        className="container_hospitalized_cases",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{int(ds.intensive_care_unit)}', style={'color': '#B22222'}),
+                            dcc.Markdown(f'*+{int(ds.icu_daily)}*' if ds.icu_daily > 0 else f'*{int(ds.icu_daily)}*',
+                                         style={'color': '#B22222'}),
+                            html.P(children=["Intensive Care Unit", html.Br(), "Portugal"])
+                        ],
+                        id="icu_cases_prt",
+                        className="container_icu_cases",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{int(ds.total_samples):,}'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            dcc.Markdown(f'*+{int(ds.new_samples):,}*'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            html.P(children=["Tested Samples", html.Br(), "Portugal"])
+                        ],
+                        id="samples_prt",
+                        className="container_samples_prt",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.death_rate}', style={'color': '#eb3434'}),
+                            dcc.Markdown(f'-'),
+                            html.P(children=["Fatality Rate (%)", html.Br(), "Portugal"])
+                        ],
+                        id="death_rate_prt",
+                        className="container_death_rate",
+                    )
+                ],
+                className="row container-display",
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H6(f'{int(ds.first_dose):,}'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            dcc.Markdown(f'*+{int(ds.first_dose_new):,}*'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            html.P(children=["Fully Vaccinated", html.Br(), "Portugal"])
+                        ],
+                        id="first_dose_prt",
+                        className="container_first_dose_prt",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{int(ds.second_dose):,}'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            dcc.Markdown(f'*+{int(ds.second_dose_new):,}*'.replace(',', ' '), style={'color': '#4db6ac'}),
+                            html.P(children=["Booster Dose", html.Br(), "Portugal"])
+                        ],
+                        id="second_dose_prt",
+                        className="container_second_dose_prt",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.rt_nacional_current:.2f}', style={'color': '#FFA500'}),
+                            dcc.Markdown(f'*+{ds.rt_nacional_diff:.2f}*' if ds.rt_nacional_diff > 0 else f'*{ds.rt_nacional_diff:.2f}*',
+                                         style={'color': '#FFA500'}),
+                            html.P(children=["R(t)", html.Br(), "Portugal"])
+                        ],
+                        id="rt_prt",
+                        className="container_rt_prt",
+                    ),
+                    html.Div(
+                        [
+                            html.H6(f'{ds.national_incidence:.1f}', style={'color': '#FFA500'}),
+                            dcc.Markdown(f'*+{ds.national_incidence_diff:.1f}*' if ds.national_incidence_diff > 0 else f'*{ds.national_incidence_diff:.1f}*',
+                                         style={'color': '#FFA500'}),
+                            html.P(children=["Incidence", html.Br(), "Portugal"])
+                        ],
+                        id="rt_main_land_prt",
+                        className="container_rt_main_land_prt",
+                    )
+                ],
+                className="row container-display",
+            ),
+            html.Div(
+                id="panel",
+                children=[
+                    graph_2_layout()
+                ]
+            ),
+            html.Div(
+                id="world_map_wrapper",
+                children=[
+                    dcc.Graph(
+                        id="world_map",
+                        figure=ds.map_figure,
+                        config={"displayModeBar": False, "scrollZoom": True},
+                    ),
+                    html.Div(id="country_detail"),
+                ],
+            ),
+            html.Div(
+                id="panel_graph_3",
+                children=[
+                    graph_3_layout()
+                ]
+            ),
+            html.Div(
+                id="panel_graph_4",
+                children=[
+                    graph_4_layout()
+                ]
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H5(f'{ds.world_confirmed:,}'.replace(',', ' '), style={'color': '#e0f7fa'}),
+                            html.P(children=["Confirmed Cases", html.Br(), "Worldwide"])
+                        ],
+                        id="confirmed_cases_world",
+                        className="container_confirmed_cases_world",
+                    ),
+                    html.Div(
+                        [
+                            html.H5(f'{ds.world_deaths:,}'.replace(',', ' '), style={'color': '#f44336'}),
+                            html.P(children=["Reported Deaths", html.Br(), "Worldwide"])
+                        ],
+                        id="reported_deaths_world",
+                        className="container_reported_deaths_world",
+                    ),
+                    html.Div(
+                        [
+                            html.H5(f'{ds.world_total_vacs:,}'.replace(',', ' '), style={'color': '#66bb6a'}),
+                            html.P(children=["Total Vaccinations", html.Br(), "Worldwide"])
+                        ],
+                        id="total_vacs_world",
+                        className="container_total_vacs_world",
+                    ),
+                    html.Div(
+                        [
+                            html.H5(f'{ds.world_fully_vacs:,}'.replace(',', ' '), style={'color': '#FFA500'}),
+                            html.P(children=["People Fully Vaccinated", html.Br(), "Worldwide"])
+                        ],
+                        id="fully_vacs_world",
+                        className="container_fully_vacs_world",
+                    )
+                ],
+                className="row container-display",
+            )
+        ]
+    )
+
+
+def loading_layout():
+    # assets/loading.js reloads the page once /readyz reports the data as loaded
+    return html.Div(
+        id="root",
+        children=[
+            html.Div(
+                id="loading_shell",
+                children=[
+                    html.P(children=["COVID-19", html.Br(), "Portugal Dashboard"]),
+                    html.P(children=["Loading the data..."])
+                ]
+            )
+        ]
+    )
+
+
+def serve_layout():
+    ds = dataset.current()
+    if ds is None:
+        return loading_layout()
+    return html.Div(
+        id="root",
+        children=[
+            side_panel_layout(ds),
+            main_panel_layout(ds)
+        ]
+    )
+
+
+def graph_2_figure(ds, data_source, time_frame, last_data, start_date=None, end_date=None):
+    window = ds.windows['graph_2', data_source, time_frame]
+    data_x_axis, columns = window.between(*windowing.date_range(ds.dates, last_data, start_date, end_date))
+    data_y_axis, marker_labels = columns['value'], columns['increase']
+
+    # Long windows are reduced to the point budget, keeping the extremes of the series
+    data_y_axis, data_x_axis, marker_labels = downsample.downsample(data_y_axis, data_x_axis, marker_labels)
+
+    return {
+        'data': [dict(
+            type=downsample.TRACE_TYPE,
+            x=data_x_axis,
+            y=data_y_axis,
+            name=data_source,
+            mode='lines+markers',
+            hovertemplate='%{y:.0f}<br>' + '<b>Increase: %{text:.1f}%</b>',
+            text=marker_labels,
+            marker={
+                'size': 8,
+                'opacity': 0.8
+            }
+        )],
+        'layout': dict(
+            margin={"t": 30, "r": 35, "b": 50, "l": 80},
+            xaxis={
+                'zeroline': False
+            },
+            yaxis={
+                'title': f'{data_source}',
+                'zeroline': False
+            },
+            plot_bgcolor='#2b2b2b',
+            paper_bgcolor='#2b2b2b',
+            font={
+                'color': '#a1a1a1',
+                'family': 'Arial',
+                'size': 13
+            }
+        )
+    }
+
+
+def graph_1_figure(ds, data_source, time_frame, last_data, start_date=None, end_date=None):
+    if time_frame == 'Weekly':
+        y_axis_time = 'week'
+    else:
+        y_axis_time = 'day'
+
+    window = ds.windows['graph_1', data_source, time_frame]
+    text_data, columns = window.between(*windowing.date_range(ds.dates, last_data, start_date, end_date))
+    x_data, y_data = columns['total'], columns['new']
+
+    return {
+        'data': [dict(
+            x=x_data,
+            y=y_data,
+            hovertemplate='Total %{customdata[0]}: %{x:.0f}' +
+            '<br><b>%{customdata[1]} %{customdata[0]}</b>: %{y:.0f}' +
+            '<br><b>%{text}</b>',
+            text=np.char.add('Date: ', text_data.astype(str)),
+            customdata=[[data_source, time_frame]] * len(text_data),
+            name=data_source,
+            mode='lines+markers',
+            marker={
+                'size': 7,
+                'opacity': 0.8
+            }
+        )],
+        'layout': dict(
+            xaxis={
+                'title': f'Total number of {data_source}',
+                'zeroline': False
+            },
+            yaxis={
+                'title': f'New {data_source} (in the past {y_axis_time})',
+                'zeroline': False
+            },
+            plot_bgcolor='#1e1e1e',
+            paper_bgcolor='#1e1e1e',
+            margin={'r': 5, 't': 10},
+            hovermode='closest',
+            font={
+                'color': 'gray',
+                'family': 'Arial',
+                'size': 13
+            }
+        )
+    }
+
+
+def placeholder_figure():
+    # Blank figure of the graphs waiting for a selection on the map
+    return {
+        'data': [dict(
+            x=[1], y=[1],
+            mode='markers',
+            hoverinfo='skip',
+            marker={
+                'size': 1,
+                'opacity': 0
+            }
+        )],
+        'layout': dict(
+            xaxis={'zeroline': False, 'showgrid': False},
+            yaxis={'zeroline': False, 'showgrid': False},
+            plot_bgcolor='#2b2b2b',
+            paper_bgcolor='#2b2b2b',
+            font={'color': '#2b2b2b'}
+        )
+    }
+
+
+def graph_3_figure(ds, region_name):
+    """Total cases of a map region over time, read from its rows of the location-sorted OWID frame."""
+    cases_country = ds.confirmed_cases_country.iloc[ds.location_slices.get(region_name, slice(0))]
+    total_cases, dates = downsample.downsample(cases_country['total_cases'], cases_country['date'])
+
+    return {
+        'data': [dict(
+            type=downsample.TRACE_TYPE,
+            x=dates,
+            y=total_cases,
+            mode='lines+markers',
+            marker={
+                'size': 8,
+                'opacity': 0.8
+            }
+        )],
+        'layout': dict(
+            margin={"t": 30, "r": 35, "b": 50, "l": 80},
+            xaxis={
+                'zeroline': False
+            },
+            yaxis={
+                'title': 'Confirmed Cases',
+                'zeroline': False
+            },
+            plot_bgcolor='#2b2b2b',
+            paper_bgcolor='#2b2b2b',
+            font={
+                'color': '#a1a1a1',
+                'family': 'Arial',
+                'size': 13
+            }
+        )
+    }
+
+
+def comparison_figure(ds, metric, locations):
+    """One line per selected location, sliced out of the location x date matrix of `metric`."""
+    dates = ds.location_matrix.dates
+    names, rows = ds.location_matrix.select(COMPARISON_METRICS[metric], locations)
+    traces = []
+    for name, row in zip(names, rows):
+        valid = np.flatnonzero(~np.isnan(row))
+        if not len(valid):
+            continue
+        span = slice(valid[0], valid[-1] + 1)
+        values, days = downsample.downsample(row[span], dates[span])
+        traces.append(dict(
+            type=downsample.TRACE_TYPE,
+            x=days,
+            y=values,
+            name=name,
+            mode='lines',
+            hovertemplate='%{y:.1f}'
+        ))
+
+    return {
+        'data': traces,
+        'layout': dict(
+            margin={"t": 30, "r": 35, "b": 50, "l": 80},
+            hovermode='x unified',
+            xaxis={
+                'zeroline': False
+            },
+            yaxis={
+                'title': metric,
+                'zeroline': False
+            },
+            plot_bgcolor='#2b2b2b',
+            paper_bgcolor='#2b2b2b',
+            font={
+                'color': '#a1a1a1',
+                'family': 'Arial',
+                'size': 13
+            }
+        )
+    }
+
+
+def build_figure(ds, build, compact, *args):
+    figure = build(ds, *args)
+    return encoding.encode_figure(figure) if compact else figure
+
+
+def register_callbacks(app, figure_cache):
+    """Register the callbacks of the dashboard on the Dash `app`, caching the graph figures in `figure_cache`."""
+
+    def snapshot():
+        ds = dataset.current()
+        if ds is None:
+            # Requests of a page built before the data was loaded
+            raise PreventUpdate
+        return ds
+
+    def windowed_figure(graph, build, data_source, time_frame, last_data, start_date, end_date):
+        """Cached figure of a Portugal graph over the time window picked in the dropdowns."""
+        ds = snapshot()
+        compact = encoding.accepted()
+        if last_data != windowing.CUSTOM:
+            # The picked dates only matter to the custom range, keep a single cache entry for the presets
+            start_date = end_date = None
+        args = (data_source, time_frame, last_data, start_date, end_date)
+        return figure_cache.get(ds.version, (graph, compact) + args, lambda: build_figure(ds, build, compact, *args))
+
+    # Labels and axis scales only depend on the inputs, they are set in the browser by assets/clientside.js
+    app.clientside_callback(
+        ClientsideFunction('dashboard', 'appName'),
+        Output("app_dropdown_text", "children"),
+        [Input("data_dropdown_component", "value"),
+         Input("time_window_dropdown_component", "value")]
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('dashboard', 'dataDescription'),
+        Output("app_body_text", "children"),
+        [Input("data_dropdown_component", "value"),
+         Input("time_dropdown_component", "value")]
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('dashboard', 'graph2Title'),
+        Output('graph_2_title', 'children'),
+        [Input('data_dropdown_component', 'value'),
+         Input('time_dropdown_component', 'value'),
+         Input('time_window_dropdown_component', 'value')]
+    )
+
+    app.clientside_callback(
+        ClientsideFunction('dashboard', 'graph3Title'),
+        Output('graph_3_title', 'children'),
+        [Input('world_map', 'clickData')]
+    )
+
+    for graph, scale in (('graph_1', 'logBothAxes'), ('graph_2', 'logYAxis'), ('graph_3', 'logYAxis')):
+        app.clientside_callback(
+            ClientsideFunction('dashboard', scale),
+            Output(graph, 'figure'),
+            [Input(f'{graph}_data', 'data'),
+             Input(f'{graph}_scale_toggle', 'value')]
+        )
+
+    @app.callback(
+        Output('graph_2_data', 'data'),
+        [Input('data_dropdown_component', 'value'),
+         Input('time_dropdown_component', 'value'),
+         Input('time_window_dropdown_component', 'value'),
+         Input('date_range_component', 'start_date'),
+         Input('date_range_component', 'end_date')]
+    )
+    def update_graph_2_data(data_source, time_frame, last_data, start_date, end_date):
+        return windowed_figure('graph_2', graph_2_figure, data_source, time_frame, last_data, start_date, end_date)
+
+    @app.callback(
+        Output('graph_1_data', 'data'),
+        [Input('data_dropdown_component', 'value'),
+         Input('time_dropdown_component', 'value'),
+         Input('time_window_dropdown_component', 'value'),
+         Input('date_range_component', 'start_date'),
+         Input('date_range_component', 'end_date')]
+    )
+    def update_graph_1_data(data_source, time_frame, last_data, start_date, end_date):
+        return windowed_figure('graph_1', graph_1_figure, data_source, time_frame, last_data, start_date, end_date)
+
+    @app.callback(
+        Output('country_detail', 'children'),
+        [Input('world_map', 'hoverData'),
+         Input('world_map', 'clickData')]
+    )
+    def update_country_detail(hover_data, click_data):
+        point_data = dash.callback_context.triggered[0]['value'] if dash.callback_context.triggered else None
+        if not point_data:
+            return []
+
+        ds = snapshot()
+        location = point_data['points'][0]['hovertext']
+        country = ds.countries[ds.countries['location'] == location]
+        if country.empty:
+            return []
+
+        country = country.iloc[0]
+        details = [html.H6(location), html.P(f"Date: {country['date']}")]
+        for column in covid_data_columns[2:]:
+            value = f'{country[column]:,.0f}'.replace(',', ' ')
+            details.append(html.P(f"{column.replace('_', ' ').capitalize()}: {value}"))
+        return details
+
+    @app.callback(
+        Output('graph_3_data', 'data'),
+        [Input('world_map', 'clickData')])
+    def display_click_data(click_data):
+        if click_data is None:
+            return placeholder_figure()
+
+        ds = snapshot()
+        compact = encoding.accepted()
+        region_name = click_data['points'][0]['hovertext']
+        return figure_cache.get(ds.version, ('graph_3', compact, region_name),
+                                lambda: build_figure(ds, graph_3_figure, compact, region_name))
+
+    @app.callback(
+        Output('graph_4', 'figure'),
+        [Input('world_map', 'selectedData'),
+         Input('comparison_metric_dropdown', 'value')])
+    def update_comparison(selected_data, metric):
+        locations = sorted({point['hovertext'] for point in (selected_data or {}).get('points', [])})
+        if not locations:
+            return placeholder_figure()
+
+        ds = snapshot()
+        compact = encoding.accepted()
+        return figure_cache.get(ds.version, ('graph_4', compact, metric) + tuple(locations),
+                                lambda: build_figure(ds, comparison_figure, compact, metric, locations))
+
+
+def load_snapshot(previous=None):
+    ds = dataset.load_dataset(previous)
+    if ds is previous:
+        return previous
+    # Registers the dash_daq scripts before the first full page is served
+    import dash_daq  # noqa: F401
+    return ds._replace(map_figure=build_map_figure(ds.countries),
+                       windows=windowing.build(ds.dates, ds.series, ds.derived))
+
+
+def warm_figure_cache(figure_cache, ds):
+    """Fill `figure_cache` with the figures of the graph callbacks for every input combination."""
+    for name, build in (('graph_1', graph_1_figure), ('graph_2', graph_2_figure)):
+        figure_cache.warm(ds.version, name, lambda compact, *args: build_figure(ds, build, compact, *args),
+                          [True, False], DATA_SOURCES, TIME_FRAMES, TIME_WINDOWS, [None], [None])
@@ -0,0 +1,376 @@
+"""
+Loading of the dashboard data into immutable snapshots.
+`load_dataset` fetches and parses every source concurrently and derives the values shown by the dashboard into a
+`Dataset`. The snapshot in use is swapped atomically by `publish`, so requests that already read `current()` keep
+working on the snapshot they started with while new requests see the new one. `Refresher` reloads the data in the
+background on an interval.
+"""
+import os
+import time
+import pathlib
+import logging
+import threading
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import ingest
+import derived
+import metrics
+import snapshot
+
+
+logger = logging.getLogger(__name__)
+
+# Where the sources are read from: unset for the upstream repositories, a folder holding local copies of the four CSV
+# files, or 'synthetic' for generated ones, sized with e.g. 'synthetic?years=3&locations=500' (see fixtures.py)
+DATA_SOURCE = os.environ.get('DATA_SOURCE', '')
+
+
+def source_url(upstream_url):
+    """URL of a source under DATA_SOURCE, given the url of its upstream file."""
+    if not DATA_SOURCE:
+        return upstream_url
+    name = upstream_url.rsplit('/', 1)[-1]
+    kind, _, query = DATA_SOURCE.partition('?')
+    if kind == 'synthetic':
+        return f'synthetic:{name}' + (f'?{query}' if query else '')
+    return str(pathlib.Path(DATA_SOURCE).joinpath(name))
+
+
+# Every source can also be pointed to a mirror, a local path, a file:// or a synthetic: url on its own
+DSSG_DATA_URL = os.environ.get(
+    'DSSG_DATA_URL', source_url('https://raw.githubusercontent.com/dssg-pt/covid19pt-data/master/data.csv'))
+DSSG_SAMPLES_URL = os.environ.get(
+    'DSSG_SAMPLES_URL', source_url('https://raw.githubusercontent.com/dssg-pt/covid19pt-data/master/amostras.csv'))
+DSSG_VACCINES_URL = os.environ.get(
+    'DSSG_VACCINES_URL', source_url('https://raw.githubusercontent.com/dssg-pt/covid19pt-data/master/vacinas.csv'))
+OWID_DATA_URL = os.environ.get(
+    'OWID_DATA_URL',
+    source_url('https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv'))
+
+# Seconds between background refreshes of the data, 0 disables them
+REFRESH_INTERVAL = float(os.environ.get('DATA_REFRESH_INTERVAL', 3600))
+# Seconds before loading the first snapshot is retried after a failure
+LOAD_RETRY_INTERVAL = float(os.environ.get('DATA_LOAD_RETRY_INTERVAL', 30))
+
+DATA_PATH = pathlib.Path(__file__).parent.joinpath("assets")
+
+
+# Columns of the DSSG data plotted by the dashboard
+SERIES = ['Confirmed Cases', 'Recovered Cases', 'Reported Deaths']
+
+
+class Dataset:
+    """
+    Immutable snapshot of the dashboard data, identified by `version`.
+    The DSSG time series are read-only NumPy arrays with compact dtypes (datetime64[D] dates, int32 counts). Their
+    derived metrics (see derived.py) are materialized with the snapshot, and the KPIs shown by the dashboard are read
+    from them once, when the snapshot is built. The parsed DSSG data itself is not kept: `data_tail` holds its last two
+    rows, enough for the KPIs and for filling forward the rows appended by the next refresh.
+    """
+    __slots__ = (
+        'version', 'source_sizes',
+        'dates', 'series', 'data_tail', 'derived', 'length_data',
+        'prt_confirmed', 'prt_confirmed_daily', 'prt_deaths', 'prt_deaths_daily', 'prt_recovered',
+        'prt_recovered_daily', 'active_cases', 'active_cases_daily', 'hospitalized', 'hospitalized_daily',
+        'intensive_care_unit', 'icu_daily', 'national_incidence', 'national_incidence_diff', 'rt_nacional_current',
+        'rt_nacional_diff', 'total_samples', 'new_samples', 'first_dose', 'second_dose', 'first_dose_new',
+        'second_dose_new', 'death_rate',
+        'confirmed_cases_country', 'location_slices', 'location_matrix', 'countries',
+        'world_confirmed', 'world_deaths', 'world_total_vacs', 'world_fully_vacs',
+        'map_figure', 'windows'
+    )
+
+    def __init__(self, **fields):
+        fields.setdefault('map_figure', None)
+        fields.setdefault('windows', None)
+        missing = set(self.__slots__) - set(fields)
+        unknown = set(fields) - set(self.__slots__)
+        if missing or unknown:
+            raise TypeError(f'Missing Dataset fields {sorted(missing)}, unknown fields {sorted(unknown)}')
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Dataset is immutable, use _replace() to build a modified copy')
+
+    def __delattr__(self, name):
+        raise AttributeError('Dataset is immutable')
+
+    def __repr__(self):
+        return f'Dataset(version={self.version!r}, length_data={self.length_data})'
+
+    def _replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Dataset(**fields)
+
+
+def frozen(values):
+    values.flags.writeable = False
+    return values
+
+
+def counts(values):
+    """Cumulative counts as int32, or as float32 when they are not all whole numbers within the int32 range."""
+    values = np.asarray(values, dtype='float64')
+    whole = np.isfinite(values).all() and np.array_equal(values, np.round(values))
+    if whole and np.abs(values).max(initial=0) < 2 ** 31:
+        return frozen(values.astype('int32'))
+    return frozen(values.astype('float32'))
+
+
+def latest(values):
+    """Last value of a series and its change from the previous one, as Python numbers."""
+    values = np.asarray(values)
+    return values[-1].item(), (values[-1] - values[-2]).item()
+
+
+class PortugalData(NamedTuple):
+    """The DSSG daily data as compact arrays (see Dataset), and its last two rows as a DataFrame."""
+    dates: np.ndarray
+    series: dict
+    tail: pd.DataFrame
+
+
+def read_data(path, offset=None, previous=None):
+    """DSSG daily data, or with `offset` the rows appended from that byte offset added to the `previous` Dataset."""
+    # Load the data from DSSG_PT (Thanks!)
+    data = pd.read_csv(path if offset is None else ingest.csv_tail(path, offset), usecols=[
+        'data', 'confirmados', 'recuperados', 'obitos', 'internados', 'internados_uci', 'incidencia_nacional',
+        'rt_nacional'],
+        skiprows=range(1, 5) if offset is None else None).rename(columns={
+            'data': 'Date',
+            'confirmados': 'Confirmed Cases',
+            'recuperados': 'Recovered Cases',
+            'obitos': 'Reported Deaths'})
+
+    # Parsed once into datetime64, the dates are only formatted when a figure is serialized
+    data['Date'] = pd.to_datetime(data['Date'], format='%d-%m-%Y')
+
+    if offset is None:
+        data = data.fillna(method='ffill').fillna(0)
+        dates = data['Date'].to_numpy(dtype='datetime64[D]')
+        series = {name: data[name].to_numpy(dtype='float64') for name in SERIES}
+    else:
+        # Rows up to the last date already ingested are skipped, the new ones are filled forward from it
+        tail = previous.data_tail
+        data = data[data['Date'] > tail['Date'].iloc[-1]]
+        data = pd.concat([tail, data], ignore_index=True).fillna(method='ffill').iloc[len(tail):]
+        dates = np.concatenate([previous.dates, data['Date'].to_numpy(dtype='datetime64[D]')])
+        series = {name: np.concatenate([previous.series[name], data[name].to_numpy(dtype='float64')])
+                  for name in SERIES}
+        data = pd.concat([tail, data])
+    return PortugalData(frozen(dates), {name: counts(values) for name, values in series.items()},
+                        data.iloc[-2:].reset_index(drop=True))
+
+
+def read_samples(path, offset=None, previous=None):
+    # Grab the number of tested samples
+    return pd.read_csv(path if offset is None else ingest.csv_tail(path, offset),
+                       usecols=['amostras', 'amostras_novas']).iloc[-1]
+
+
+def read_vaccines(path, offset=None, previous=None):
+    # Grab the number of vaccines
+    return pd.read_csv(path if offset is None else ingest.csv_tail(path, offset),
+                       usecols=['pessoas_vacinadas_completamente', 'pessoas_vacinadas_completamente_novas',
+                                'pessoas_reforço', 'pessoas_reforço_novas']).iloc[-1]
+
+
+def read_owid(path, offset=None, previous=None):
+    # Appended rows are merged into the Feather store by the ingest step itself
+    return ingest.load_owid(path)
+
+
+SOURCES = {
+    'data': snapshot.Source(DSSG_DATA_URL),
+    'samples': snapshot.Source(DSSG_SAMPLES_URL),
+    'vaccines': snapshot.Source(DSSG_VACCINES_URL),
+    # Every upstream update of the OWID file rewrites rows throughout it, so a Range request would always be followed
+    # by a full download; appended rows are still found by comparing the download with the snapshot
+    'owid': snapshot.Source(OWID_DATA_URL, timeout=120, range_requests=False)
+}
+
+PARSERS = {
+    'data': read_data,
+    'samples': read_samples,
+    'vaccines': read_vaccines,
+    'owid': read_owid
+}
+
+
+def parse_all(paths, previous=None):
+    """
+    Parse every fetched source concurrently, returning a dict of name -> parsed data.
+    Sources whose snapshot only appended data to the one `previous` was built from are parsed incrementally.
+    """
+
+    def timed_parse(name):
+        start = time.perf_counter()
+        offset = snapshot.appended_from(paths[name])
+        parsed = None
+        if previous is not None and offset is not None and offset == previous.source_sizes.get(name):
+            try:
+                parsed = PARSERS[name](paths[name], offset, previous)
+            except (IndexError, ValueError):
+                logger.warning('Appending to source %s failed, parsing it again', name, exc_info=True)
+        if parsed is None:
+            parsed = PARSERS[name](paths[name])
+        seconds = time.perf_counter() - start
+        metrics.SOURCE_PARSE_SECONDS.observe(seconds, name)
+        logger.info('Source %s parsed in %.2fs', name, seconds)
+        return parsed
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        futures = {name: executor.submit(timed_parse, name) for name in paths}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def load_dataset(previous=None):
+    """Fetch every source and build a new Dataset, or return `previous` when none of the sources changed."""
+    start = time.perf_counter()
+    fetched = snapshot.fetch_all(SOURCES)
+    for name, source in fetched.items():
+        metrics.SOURCE_FETCH_SECONDS.observe(source.seconds, name)
+    paths = {name: source.path for name, source in fetched.items()}
+    version = snapshot.version(*paths.values())
+
+    if previous is not None and previous.version == version:
+        return previous
+
+    parsed = parse_all(paths, previous)
+    data = parsed['data']
+    samples_prt = parsed['samples']
+    vaccines_prt = parsed['vaccines']
+    confirmed_cases_country = parsed['owid']
+
+    dates, series = data.dates, data.series
+    # Rolling means, growth rates, active cases and the case fatality rate as full time series
+    derived_series = derived.portugal(series)
+    hospitalized, hospitalized_daily = latest(data.tail['internados'])
+    intensive_care_unit, icu_daily = latest(data.tail['internados_uci'])
+    national_incidence, national_incidence_diff = latest(data.tail['incidencia_nacional'])
+    rt_nacional_current, rt_nacional_diff = latest(data.tail['rt_nacional'])
+
+    coordinates = pd.read_csv(DATA_PATH.joinpath('coordinates.csv'), sep=';')
+
+    countries_grouped = ingest.load_owid_latest(paths['owid'])
+    countries = countries_grouped[countries_grouped['location'].isin(coordinates['location'])]
+    countries = countries.merge(coordinates).fillna(0)
+    countries['date'] = countries['date'].dt.strftime('%Y-%m-%d')
+
+    world_covid_data = countries_grouped[countries_grouped['location'] == 'World']
+
+    metrics.LOAD_SECONDS.observe(time.perf_counter() - start)
+    return Dataset(
+        version=version,
+        source_sizes={name: path.stat().st_size for name, path in paths.items()},
+        dates=dates,
+        series=series,
+        data_tail=data.tail,
+        length_data=len(dates),
+        derived=derived_series,
+        prt_confirmed=series['Confirmed Cases'][-1].item(),
+        prt_confirmed_daily=derived.latest(derived_series['Confirmed Cases', 'new']),
+        prt_deaths=series['Reported Deaths'][-1].item(),
+        prt_deaths_daily=derived.latest(derived_series['Reported Deaths', 'new']),
+        prt_recovered=series['Recovered Cases'][-1].item(),
+        prt_recovered_daily=derived.latest(derived_series['Recovered Cases', 'new']),
+        active_cases=derived.latest(derived_series['Active Cases', 'total']),
+        active_cases_daily=derived.latest(derived_series['Active Cases', 'new']),
+        hospitalized=hospitalized,
+        hospitalized_daily=hospitalized_daily,
+        intensive_care_unit=intensive_care_unit,
+        icu_daily=icu_daily,
+        national_incidence=national_incidence,
+        national_incidence_diff=national_incidence_diff,
+        rt_nacional_current=rt_nacional_current,
+        rt_nacional_diff=rt_nacional_diff,
+        total_samples=samples_prt['amostras'],
+        new_samples=samples_prt['amostras_novas'],
+        first_dose=vaccines_prt['pessoas_vacinadas_completamente'],
+        second_dose=vaccines_prt['pessoas_reforço'],
+        first_dose_new=vaccines_prt['pessoas_vacinadas_completamente_novas'],
+        second_dose_new=vaccines_prt['pessoas_reforço_novas'],
+        death_rate=round(derived_series['Case Fatality Rate', 'lagged'][-1].item(), 2),
+        confirmed_cases_country=confirmed_cases_country,
+        # Rows of every location in the location-sorted frame, so a map click is a slice instead of a full scan
+        location_slices={location: slice(start, stop)
+                         for location, (start, stop) in ingest.location_ranges(confirmed_cases_country).items()},
+        location_matrix=derived.locations(
+            confirmed_cases_country,
+            countries_grouped.set_index(countries_grouped['location'].astype(str))['population']),
+        countries=countries,
+        world_confirmed=int(world_covid_data['total_cases'].values[0]),
+        world_deaths=int(world_covid_data['total_deaths'].values[0]),
+        world_total_vacs=int(world_covid_data['total_vaccinations'].values[0]),
+        world_fully_vacs=int(world_covid_data['people_fully_vaccinated'].values[0])
+    )
+
+
+_current = None
+_published_at = None
+_listeners = []
+
+
+def current():
+    """The snapshot in use. Read it once per request and keep working on that object."""
+    return _current
+
+
+def age():
+    """Seconds since the snapshot in use was published."""
+    return time.time() - _published_at if _published_at is not None else None
+
+
+def publish(dataset):
+    """Atomically replace the snapshot in use and notify the listeners."""
+    global _current, _published_at
+    _current = dataset
+    _published_at = time.time()
+    for listener in _listeners:
+        listener(dataset)
+
+
+def on_publish(listener):
+    _listeners.append(listener)
+    return listener
+
+
+class Refresher(threading.Thread):
+    """
+    Daemon thread that loads the first snapshot with `load(None)` if none was published yet, then rebuilds it with
+    `load(current())` every `interval` seconds.
+    """
+
+    def __init__(self, load, interval=REFRESH_INTERVAL):
+        super().__init__(name='dataset-refresher', daemon=True)
+        self.load = load
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while current() is None and not self.stopped.is_set():
+            try:
+                publish(self.load(None))
+            except Exception:
+                logger.exception('Loading the data failed, retrying in %.0fs', LOAD_RETRY_INTERVAL)
+                self.stopped.wait(LOAD_RETRY_INTERVAL)
+
+        if self.interval <= 0:
+            return
+        while not self.stopped.wait(self.interval):
+            previous = current()
+            try:
+                dataset = self.load(previous)
+            except Exception:
+                logger.exception('Refreshing the data failed, keeping snapshot %s', previous.version)
+                continue
+            if dataset is not previous:
+                logger.info('Swapping snapshot %s for %s', previous.version, dataset.version)
+                publish(dataset)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,108 @@
+"""
+Derived metrics of a snapshot, materialized once when the snapshot is built.
+`portugal` turns the cumulative DSSG series into full time series of new cases, rolling means, growth rates, active
+cases and the lagged case fatality rate, aligned with the snapshot dates. `locations` computes the same metrics for
+every OWID location as location x date matrices normalized per million people, so comparing any selection of
+countries only takes their rows. Callbacks and KPI cards read these arrays instead of deriving values per request.
+Values that are not defined (the first days of a rolling window, the growth from zero, ...) are NaN.
+"""
+import numpy as np
+import transforms
+
+
+ROLLING_WINDOWS = (7, 14)
+# The death rate is calculated with the equation CFR = deaths at day.x / cases at day.x-{T}
+# where T = average time period from case confirmation to death, in our case T = 7
+# (Source: https://www.worldometers.info/coronavirus/coronavirus-death-rate/)
+CFR_LAG = 7
+
+# Metrics of `portugal` that are whole numbers of cases, every other one is stored as float32
+COUNT_METRICS = {'total', 'new'} | {f'new_{window}' for window in ROLLING_WINDOWS}
+
+# OWID columns of daily new counts averaged per million people
+LOCATION_COLUMNS = ('new_cases', 'new_deaths', 'new_vaccinations')
+
+
+def frozen(values):
+    values.flags.writeable = False
+    return values
+
+
+def case_fatality_rate(deaths, cases):
+    return transforms.ratio(deaths, transforms.lagged(cases, CFR_LAG)) * 100
+
+
+def latest(values):
+    """Last value of a derived series as a Python number, an int when it is a whole number."""
+    value = values[-1].item()
+    return int(value) if value.is_integer() else value
+
+
+def portugal(series):
+    """
+    Derived series of the cumulative DSSG `series` (name -> array) and of the active cases, keyed by
+    (series name, metric): 'new' cases per day, 'new_{w}' cases and 'mean_{w}' cases per day over the previous w days
+    with their daily 'growth' ('mean_{w}_growth'), for every w in ROLLING_WINDOWS. The active cases themselves are
+    ('Active Cases', 'total') and the lagged case fatality rate ('Case Fatality Rate', 'lagged'). Counts are float64,
+    the means and rates are stored as float32 like the location matrices.
+    """
+    totals = dict(series)
+    totals['Active Cases'] = series['Confirmed Cases'] - series['Reported Deaths'] - series['Recovered Cases']
+
+    derived = {('Active Cases', 'total'): np.asarray(totals['Active Cases'], dtype='float64')}
+    for name, values in totals.items():
+        derived[name, 'new'] = transforms.lag_diff(values, 1)
+        derived[name, 'growth'] = transforms.pct_change(values)
+        for window in ROLLING_WINDOWS:
+            new = derived[name, f'new_{window}'] = transforms.lag_diff(values, window)
+            mean = derived[name, f'mean_{window}'] = new / window
+            derived[name, f'mean_{window}_growth'] = transforms.pct_change(mean)
+    derived['Case Fatality Rate', 'lagged'] = case_fatality_rate(series['Reported Deaths'], series['Confirmed Cases'])
+    return {key: frozen(values if key[1] in COUNT_METRICS else values.astype('float32'))
+            for key, values in derived.items()}
+
+
+class LocationMatrix:
+    """Per metric (locations x dates) float32 matrices, NaN on the days a location has no data."""
+    __slots__ = ('locations', 'rows', 'dates', 'values')
+
+    def __init__(self, locations, dates, values):
+        self.locations = locations
+        self.rows = {location: row for row, location in enumerate(locations)}
+        self.dates = dates
+        self.values = values
+
+    def select(self, metric, locations):
+        """The known `locations` among the given ones and their rows of `metric`, as a (locations, dates) array."""
+        names = [location for location in locations if location in self.rows]
+        return names, self.values[metric][[self.rows[name] for name in names]]
+
+
+def locations(frame, population):
+    """
+    Matrices of the OWID `frame` (categorical location, datetime date) keyed by (column, metric): the 'mean_{w}' per
+    million people of the new counts of every LOCATION_COLUMNS over the previous w days, its daily growth
+    ('mean_{w}_growth'), and the lagged ('case_fatality_rate', 'lagged'). `population` is a Series indexed by location.
+    """
+    names = [str(location) for location in frame['location'].cat.categories]
+    rows = frame['location'].cat.codes.to_numpy()
+    days = frame['date'].to_numpy(dtype='datetime64[D]')
+    dates = np.unique(days)
+    columns = np.searchsorted(dates, days)
+    millions = population.reindex(names).to_numpy(dtype='float64') / 1e6
+    millions[~(millions > 0)] = np.nan
+
+    def matrix(column):
+        values = np.full((len(names), len(dates)), np.nan)
+        values[rows, columns] = frame[column].to_numpy(dtype='float64')
+        return values
+
+    derived = {}
+    for column in LOCATION_COLUMNS:
+        per_million = transforms.ratio(matrix(column), millions[:, np.newaxis])
+        for window in ROLLING_WINDOWS:
+            mean = derived[column, f'mean_{window}'] = transforms.nan_rolling_mean(per_million, window)
+            derived[column, f'mean_{window}_growth'] = transforms.pct_change(mean)
+    derived['case_fatality_rate', 'lagged'] = case_fatality_rate(matrix('total_deaths'), matrix('total_cases'))
+    values = {key: frozen(matrix.astype('float32')) for key, matrix in derived.items()}
+    return LocationMatrix(names, frozen(dates), values)
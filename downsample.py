@@ -0,0 +1,78 @@
+"""
+Server-side downsampling of long time series before they are sent to the browser.
+Series longer than the point budget are reduced to at most `budget` points, always keeping the first and last ones.
+`minmax` keeps the minimum and maximum of every bucket, so the visual extremes of the series are preserved exactly,
+while `lttb` (Largest-Triangle-Three-Buckets) keeps the points that best preserve the shape of the line. Short windows
+fit within the budget and are sent untouched.
+"""
+import os
+import numpy as np
+
+
+# Maximum number of points sent per trace, 0 disables downsampling
+MAX_POINTS = int(os.environ.get('MAX_POINTS', 400))
+METHOD = os.environ.get('DOWNSAMPLE_METHOD', 'minmax')
+
+# WebGL traces render long series much faster than SVG ones
+TRACE_TYPE = 'scattergl' if os.environ.get('USE_WEBGL') else 'scatter'
+
+
+def minmax_indices(y, budget):
+    """Indices of the first and last points plus the minimum and maximum of (budget - 2) / 2 buckets."""
+    y = np.asarray(y, dtype='float64')
+    interior = np.arange(1, len(y) - 1)
+    buckets = max((budget - 2) // 2, 1)
+    # Same buckets as np.array_split, the first ones one point longer when the points do not divide evenly
+    sizes = np.full(buckets, len(interior) // buckets)
+    sizes[:len(interior) % buckets] += 1
+    bucket_ids = np.repeat(np.arange(buckets), sizes)
+    values = y[interior]
+    missing = np.isnan(values)
+    # Stable sorts by bucket then value put the first minimum (maximum) of every bucket first, NaN last
+    minimum = interior[np.lexsort((np.where(missing, np.inf, values), bucket_ids))]
+    maximum = interior[np.lexsort((np.where(missing, np.inf, -values), bucket_ids))]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[sizes > 0]
+    valid = ~missing[minimum[starts] - 1]
+    keep = np.concatenate([[0, len(y) - 1], minimum[starts][valid], maximum[starts][valid]])
+    return np.unique(keep)
+
+
+def lttb_indices(y, budget):
+    """Indices selected by Largest-Triangle-Three-Buckets over evenly spaced x."""
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    x = np.arange(len(y), dtype='float64')
+    buckets = np.array_split(np.arange(1, len(y) - 1), budget - 2)
+    keep = [0]
+    for i, bucket in enumerate(buckets):
+        next_bucket = buckets[i + 1] if i + 1 < len(buckets) else np.array([len(y) - 1])
+        next_x, next_y = x[next_bucket].mean(), y[next_bucket].mean()
+        a = keep[-1]
+        areas = np.abs((x[a] - next_x) * (y[bucket] - y[a]) - (x[a] - x[bucket]) * (next_y - y[a]))
+        keep.append(bucket[np.argmax(areas)])
+    keep.append(len(y) - 1)
+    return np.array(keep)
+
+
+def take(values, indices):
+    # Series keep their dtype, e.g. datetime64 dates that would otherwise be serialized as integers
+    if hasattr(values, 'iloc'):
+        return values.iloc[indices]
+    return np.asarray(values)[indices]
+
+
+METHODS = {
+    'minmax': minmax_indices,
+    'lttb': lttb_indices
+}
+
+
+def downsample(y, *columns, budget=None, method=None):
+    """
+    Reduce `y` and the columns aligned with it (x values, hover text, ...) to at most `budget` points.
+    The inputs are returned unchanged when they already fit within the budget.
+    """
+    budget = MAX_POINTS if budget is None else budget
+    if not budget or len(y) <= max(budget, 3) or (method or METHOD) not in METHODS:
+        return (y,) + columns
+    indices = METHODS[method or METHOD](y, budget)
+    return tuple(take(values, indices) for values in (y,) + columns)
@@ -0,0 +1,75 @@
+"""
+Compact encoding of the figure arrays sent by the callbacks.
+Numeric columns are sent as base64 typed arrays (`{'dtype': 'f4', 'bdata': ...}`) and daily dates as a date origin
+plus base64 int32 day offsets, instead of a JSON number or 'YYYY-MM-DD' string per point. The encoding is negotiated:
+the request hook in `assets/figure_encoding.js` marks the callback requests of clients that can decode it, and its
+response hook restores the arrays before the figure reaches the graph. Other clients get plain JSON.
+"""
+import base64
+import flask
+import numpy as np
+
+
+ENCODING = 'b64'
+
+# Trace attributes holding the per-point data
+ENCODED_KEYS = ('x', 'y')
+
+
+def accepted():
+    """True when the callback request being served comes from a client that decodes compact arrays."""
+    if not flask.has_request_context():
+        return False
+    return (flask.request.get_json(silent=True) or {}).get('encoding') == ENCODING
+
+
+def typed_array(values, dtype):
+    return {'dtype': dtype, 'bdata': base64.b64encode(values.astype(f'<{dtype}').tobytes()).decode('ascii')}
+
+
+def encode_dates(values):
+    """Daily dates as the first date and int32 day offsets from it, or None if the values are not daily dates."""
+    try:
+        days = values.astype('datetime64[D]')
+    except (TypeError, ValueError):
+        return None
+    if np.isnat(days).any() or (values.dtype.kind == 'M' and (days != values).any()):
+        return None
+    encoded = typed_array((days - days[0]).astype('int32'), 'i4')
+    encoded['origin'] = str(days[0])
+    return encoded
+
+
+def encode_array(values):
+    """Compact form of a column of numbers or dates, or None to leave it as a JSON list."""
+    values = np.asarray(values)
+    if not len(values):
+        return None
+    if values.dtype.kind == 'M' or (values.dtype.kind in 'OU' and isinstance(values[0], str)):
+        return encode_dates(values)
+    if values.dtype.kind in 'iub':
+        if np.abs(values).max() < 2 ** 31:
+            return typed_array(values, 'i4')
+        values = values.astype('float64')
+    if values.dtype.kind == 'f':
+        # Plotly draws null and NaN alike, as a gap
+        values = np.where(np.isfinite(values), values, np.nan)
+        narrow = values.astype('float32')
+        if np.array_equal(narrow.astype('float64'), values, equal_nan=True):
+            return typed_array(narrow, 'f4')
+        return typed_array(values, 'f8')
+    return None
+
+
+def encode_figure(figure):
+    """Copy of `figure` with the per-point data of its traces in compact form."""
+    traces = []
+    for trace in figure['data']:
+        trace = dict(trace)
+        for key in ENCODED_KEYS:
+            if key in trace and not np.isscalar(trace[key]):
+                encoded = encode_array(trace[key])
+                if encoded is not None:
+                    trace[key] = encoded
+        traces.append(trace)
+    return dict(figure, data=traces)
@@ -0,0 +1,49 @@
+"""
+Cache of callback figures keyed on the data snapshot version and the callback inputs.
+The graph callbacks only take a small, finite set of inputs, so their figures are kept in an LRU cache. Entries of
+older snapshots are dropped once a new snapshot is published. Figures are stored already serialized and decoded back
+into plain JSON types, which makes the serialization Dash does on every response a cheap pass over lists and dicts.
+"""
+import json
+import itertools
+import threading
+from collections import OrderedDict
+import plotly
+
+
+class FigureCache:
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, build):
+        key = (version,) + tuple(key)
+        with self.lock:
+            if key in self.figures:
+                self.figures.move_to_end(key)
+                self.hits += 1
+                return self.figures[key]
+            self.misses += 1
+
+        figure = json.loads(json.dumps(build(), cls=plotly.utils.PlotlyJSONEncoder))
+
+        with self.lock:
+            self.figures[key] = figure
+            while len(self.figures) > self.maxsize:
+                self.figures.popitem(last=False)
+        return figure
+
+    def retain(self, version):
+        """Drop the figures of every snapshot but `version`."""
+        with self.lock:
+            for key in [key for key in self.figures if key[0] != version]:
+                del self.figures[key]
+
+    def warm(self, version, name, build, *grids):
+        """Fill the cache with `build(*args)` for every combination of the given input values."""
+        for args in itertools.product(*grids):
+            self.get(version, (name,) + args, lambda: build(*args))
@@ -0,0 +1,217 @@
+"""
+Synthetic copies of the four data sources, shaped like the DSSG and OWID CSV files, for running and load testing the
+dashboard without network access. The size of the data is set by the number of `years` covered and the number of OWID
+`locations`; the same parameters and `seed` always produce the same files. The sources read them through `synthetic:`
+urls (e.g. `synthetic:owid-covid-data.csv?years=3&locations=500`, see snapshot.fetch), or they can be written to a
+folder with
+
+    python fixtures.py FOLDER [--years 2] [--locations 250] [--seed 0]
+"""
+import pathlib
+import argparse
+import numpy as np
+import pandas as pd
+from urllib.parse import urlparse, parse_qsl
+
+
+COORDINATES_PATH = pathlib.Path(__file__).parent.joinpath('assets', 'coordinates.csv')
+
+YEARS = 2
+LOCATIONS = 250
+SEED = 0
+
+# First dates of the upstream files, every file ends on the same date
+DSSG_START = np.datetime64('2020-02-26')
+OWID_START = np.datetime64('2020-01-22')
+# Population of Portugal, which scales the DSSG series
+PORTUGAL_POPULATION = 10_300_000
+
+
+def days_between(start, years):
+    return int(round(years * 365)) + (DSSG_START - start).astype(int)
+
+
+def waves(rng, rows, days):
+    """(rows, days) epidemic curves peaking at 1, a sum of gaussian waves at random dates (about three per year)."""
+    t = np.arange(days)
+    curves = np.zeros((rows, days))
+    for _ in range(max(2, round(3 * days / 365))):
+        centers = rng.uniform(0, days, (rows, 1))
+        widths = rng.uniform(15, 60, (rows, 1))
+        curves += rng.lognormal(0, 0.7, (rows, 1)) * np.exp(-0.5 * ((t - centers) / widths) ** 2)
+    return curves / curves.max(axis=1, keepdims=True)
+
+
+def lagged_deaths(rng, new_cases, rate=0.015, lag=10):
+    """Deaths of a fraction of the cases confirmed `lag` days before."""
+    lagged = np.zeros_like(new_cases)
+    lagged[..., lag:] = new_cases[..., :-lag]
+    return rng.binomial(lagged, rate)
+
+
+def portugal(years, seed):
+    """Daily new cases and deaths of the DSSG series, shared by the three DSSG files."""
+    rng = np.random.default_rng([seed, 0])
+    days = days_between(DSSG_START, years)
+    new_cases = rng.poisson(waves(rng, 1, days)[0] * PORTUGAL_POPULATION * 1e-3)
+    new_cases[:2] = 0
+    return new_cases, lagged_deaths(rng, new_cases)
+
+
+def dssg_dates(years):
+    return pd.to_datetime(np.arange(DSSG_START, DSSG_START + days_between(DSSG_START, years))).strftime('%d-%m-%Y')
+
+
+def write_data(path, years=YEARS, locations=LOCATIONS, seed=SEED):
+    rng = np.random.default_rng([seed, 1])
+    new_cases, new_deaths = portugal(years, seed)
+    confirmed, deaths = np.cumsum(new_cases), np.cumsum(new_deaths)
+    # Cases recover two weeks after being confirmed, unless they died
+    recovered = np.zeros_like(confirmed)
+    recovered[14:] = np.maximum(confirmed[:-14] - deaths[14:], 0)
+    active = confirmed - recovered - deaths
+    hospitalized = np.round(active * rng.uniform(0.02, 0.04, len(active)))
+    weekly = pd.Series(new_cases).rolling(7).sum()
+    dates = dssg_dates(years)
+    pd.DataFrame({
+        'data': dates,
+        'data_dados': dates + ' 00:00',
+        'confirmados': confirmed,
+        'recuperados': recovered,
+        'obitos': deaths,
+        'internados': hospitalized,
+        'internados_uci': np.round(hospitalized * 0.15),
+        'incidencia_nacional': pd.Series(new_cases).rolling(14).sum() * 1e5 / PORTUGAL_POPULATION,
+        'rt_nacional': (weekly / weekly.shift(4)).where(lambda rt: np.isfinite(rt)).round(2)
+    }).to_csv(path, index=False)
+
+
+def write_samples(path, years=YEARS, locations=LOCATIONS, seed=SEED):
+    rng = np.random.default_rng([seed, 2])
+    new_cases, _ = portugal(years, seed)
+    new_samples = new_cases * rng.integers(8, 20, len(new_cases)) + 1000
+    pd.DataFrame({'data': dssg_dates(years), 'amostras': np.cumsum(new_samples),
+                  'amostras_novas': new_samples}).to_csv(path, index=False)
+
+
+def vaccinations(rng, population, days, start):
+    """Daily vaccinations ramping up from day `start` to about 1% of the population per day."""
+    ramp = np.clip((np.arange(days) - start) / 90, 0, 1)
+    return np.round(rng.uniform(0.005, 0.01, (len(population), 1)) * population[:, np.newaxis] * ramp)
+
+
+def write_vaccines(path, years=YEARS, locations=LOCATIONS, seed=SEED):
+    rng = np.random.default_rng([seed, 3])
+    days = days_between(DSSG_START, years)
+    new = vaccinations(rng, np.array([PORTUGAL_POPULATION]), days, min(300, days // 2))[0]
+    fully = np.minimum(np.cumsum(new * 0.45), PORTUGAL_POPULATION * 0.85)
+    booster = np.minimum(np.cumsum(new * 0.2), PORTUGAL_POPULATION * 0.6)
+    pd.DataFrame({
+        'data': dssg_dates(years),
+        'pessoas_vacinadas_completamente': fully,
+        'pessoas_vacinadas_completamente_novas': np.diff(fully, prepend=0),
+        'pessoas_reforço': booster,
+        'pessoas_reforço_novas': np.diff(booster, prepend=0)
+    }).to_csv(path, index=False)
+
+
+def location_names(locations):
+    """`locations` names: 'World', the locations of the map and then numbered regions."""
+    names = ['World'] + sorted(pd.read_csv(COORDINATES_PATH, sep=';')['location'])
+    names += [f'Region {number}' for number in range(1, locations - len(names) + 1)]
+    return names[:locations]
+
+
+def write_owid(path, years=YEARS, locations=LOCATIONS, seed=SEED):
+    rng = np.random.default_rng([seed, 4])
+    days = days_between(OWID_START, years)
+    names = np.array(location_names(max(locations, 1)))
+    countries = len(names) - 1
+    population = np.round(np.clip(rng.lognormal(np.log(1e7), 1.5, countries), 1e4, 1.5e9))
+    # Every country reports from a random day in the first two months
+    first_day = rng.integers(0, min(60, days), countries)
+    reported = np.arange(days) >= first_day[:, np.newaxis]
+
+    new_cases = rng.poisson(waves(rng, countries, days) * population[:, np.newaxis] * 1e-3) * reported
+    new_deaths = lagged_deaths(rng, new_cases)
+    tested = rng.random((countries, days)) < 0.9
+    new_tests = np.where(tested, new_cases * rng.integers(5, 30, (countries, days)), np.nan)
+    new_vaccinations = vaccinations(rng, population, days, min(330, days // 2))
+
+    # The World is the sum of every country, from the first day
+    population = np.append(population.sum(), population)
+    reported = np.vstack([np.ones(days, dtype=bool), reported])
+    daily = (new_cases, new_deaths, new_tests, new_vaccinations)
+    new_cases, new_deaths, new_tests, new_vaccinations = (np.vstack([np.nansum(values, axis=0), values])
+                                                          for values in daily)
+    total_vaccinations = np.cumsum(new_vaccinations, axis=1)
+    vaccinated = np.where(new_vaccinations > 0, total_vaccinations, np.nan)
+
+    # Rows sorted by location and date, like the upstream file
+    order = np.argsort(names, kind='stable')
+    reported = reported[order]
+    rows, day = np.nonzero(reported)
+
+    def column(values):
+        return values[order][reported]
+
+    frame = pd.DataFrame({
+        'iso_code': 'SYN',
+        'continent': np.where(names == 'World', '', 'Synthetic')[order][rows],
+        'location': names[order][rows],
+        'date': pd.to_datetime(OWID_START + day).strftime('%Y-%m-%d'),
+        'total_cases': column(np.cumsum(new_cases, axis=1)),
+        'new_cases': column(new_cases),
+        'total_deaths': column(np.cumsum(new_deaths, axis=1)),
+        'new_deaths': column(new_deaths),
+        'new_tests': column(new_tests),
+        'total_vaccinations': column(vaccinated),
+        'people_vaccinated': column(np.minimum(vaccinated * 0.55, population[:, np.newaxis] * 0.9)),
+        'people_fully_vaccinated': column(np.minimum(vaccinated * 0.4, population[:, np.newaxis] * 0.85)),
+        'new_vaccinations': column(np.where(new_vaccinations > 0, new_vaccinations, np.nan)),
+        'population': population[order][rows]
+    })
+    frame.to_csv(path, index=False, float_format='%.0f')
+
+
+WRITERS = {
+    'data.csv': write_data,
+    'amostras.csv': write_samples,
+    'vacinas.csv': write_vaccines,
+    'owid-covid-data.csv': write_owid
+}
+
+
+def parameters(url):
+    """File name and (years, locations, seed) of a `synthetic:` url."""
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query))
+    return parsed.path, {'years': float(query.get('years', YEARS)), 'locations': int(query.get('locations', LOCATIONS)),
+                         'seed': int(query.get('seed', SEED))}
+
+
+def write_url(url, path):
+    """Write the file of a `synthetic:` url into `path`."""
+    name, kwargs = parameters(url)
+    if name not in WRITERS:
+        raise ValueError(f'No synthetic source named {name!r}, expected one of {", ".join(WRITERS)}')
+    WRITERS[name](path, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('folder')
+    parser.add_argument('--years', type=float, default=YEARS)
+    parser.add_argument('--locations', type=int, default=LOCATIONS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    folder = pathlib.Path(args.folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, write in WRITERS.items():
+        write(folder.joinpath(name), years=args.years, locations=args.locations, seed=args.seed)
+        print(f'{folder.joinpath(name)}: {folder.joinpath(name).stat().st_size:,} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings.
+By default every worker starts serving right away and loads the data itself in the background, answering /healthz
+and serving a loading page meanwhile, so each worker holds its own copy of the derived arrays (the OWID columns are
+mapped from the same Feather file and stay shared).
+
+Sharing the data between the workers is opt-in. GUNICORN_PRELOAD=1 loads the data once in the master process
+instead, before the workers are forked, which trades a startup during which nothing answers (not even /healthz) for
+less memory. The workers attach to that dataset instead of each building their own: the OWID columns are read-only
+views over the memory-mapped Feather store and the remaining arrays are never written to, so their pages stay shared
+and the memory used per worker (PSS) stays close to flat as workers are added. That only lasts until the first
+refresh that changes the data: every worker then builds the new snapshot on its own, and the arrays other than the
+OWID columns are private to each worker again until gunicorn is restarted.
+
+The workers are `gthread` workers by default, each serving GUNICORN_THREADS requests at once, so fast callbacks do not
+queue behind a slow one on the same worker. GUNICORN_WORKER_CLASS=gevent serves many more concurrent connections per
+worker (it needs `pip install gevent`); the process is then monkey-patched here, before the app is preloaded. The
+heavy callbacks run in the worker itself: building the country and comparison figures takes a few milliseconds, less
+than what sending them to a process pool would cost.
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Sharing the data between the workers is opt-in, and only covers the first snapshot: off by default so that the
+# workers answer /healthz while the data loads
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+if worker_class == 'gevent':
+    # Patched before anything creates locks or threads, which the preloaded app and the data loader do
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        server.log.info('Dataset %s loaded once in the master, sharing it with the workers', app.load().version)
+    server.log.info('Serving with %d %s workers', workers, worker_class)
+
+
+def post_worker_init(worker):
+    import app
+    # Loads the data unless it was inherited from the master, then keeps it refreshed
+    app.start_loading()
@@ -0,0 +1,162 @@
+"""
+HTTP caching and compression of the Dash layout and callback responses.
+Both only depend on the data snapshot and the request, so their responses are kept compressed in an LRU cache keyed
+on the snapshot version and the request body, bounded by the bytes of the bodies it holds. Every cached response
+carries a strong ETag made of the snapshot version, a digest of the body and the content coding, so the brotli, gzip
+and identity bodies have distinct validators: a repeat visitor revalidating the layout gets a 304 while the snapshot
+is unchanged, and identical callback requests are answered from the cache without running the callback or
+compressing again. Brotli is used when the client accepts it and the `brotli` package is installed, gzip otherwise.
+"""
+import os
+import gzip
+import hashlib
+import threading
+from typing import NamedTuple
+from collections import OrderedDict
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bytes of response bodies kept by the cache, every compressed copy included
+CACHE_BYTES = int(os.environ.get('HTTP_CACHE_BYTES', 64 * 2 ** 20))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def negotiate(request):
+    """Best content encoding accepted by the client, None for the identity."""
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+class Entry(NamedTuple):
+    key: tuple
+    tag: str
+    mimetype: str
+    bodies: dict
+
+    def etag(self, encoding):
+        return f'"{self.tag}-{encoding}"' if encoding is not None else f'"{self.tag}"'
+
+    @property
+    def nbytes(self):
+        return sum(len(body) for body in self.bodies.values())
+
+
+class ResponseCache:
+
+    def __init__(self, maxbytes=CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, entry):
+        with self.lock:
+            previous = self.entries.pop(entry.key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self.entries[entry.key] = entry
+            self.nbytes += entry.nbytes
+            self.evict()
+
+    def add_body(self, entry, encoding, body):
+        """Store the body of `entry` compressed with `encoding`, counting it if the entry is still cached."""
+        with self.lock:
+            if encoding in entry.bodies:
+                return
+            entry.bodies[encoding] = body
+            if self.entries.get(entry.key) is entry:
+                self.nbytes += len(body)
+                self.evict()
+
+    def evict(self):
+        while self.nbytes > self.maxbytes and self.entries:
+            self.nbytes -= self.entries.popitem(last=False)[1].nbytes
+
+    def retain(self, version):
+        """Drop the responses of every snapshot but `version`."""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] != version]:
+                self.nbytes -= self.entries.pop(key).nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+def respond(cache, entry):
+    request = flask.request
+    encoding = negotiate(request)
+    etag = entry.etag(encoding)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(etag.strip('"')):
+        return flask.Response(status=304, headers=headers)
+
+    if encoding not in entry.bodies:
+        # Compressed once per entry and encoding, concurrent requests may both do it
+        cache.add_body(entry, encoding, compress(entry.bodies[None], encoding))
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return flask.Response(entry.bodies[encoding], mimetype=entry.mimetype, headers=headers)
+
+
+def install(app, version, cache):
+    """
+    Serve the layout and callback responses of the Dash `app` through `cache`.
+    `version` returns the version of the snapshot in use.
+    """
+    prefix = app.config.routes_pathname_prefix
+    paths = {prefix + '_dash-layout', prefix + '_dash-update-component'}
+
+    @app.server.before_request
+    def serve_cached():
+        request = flask.request
+        if request.path not in paths:
+            return None
+        key = (version(), request.path, hashlib.sha1(request.get_data()).hexdigest())
+        entry = cache.get(key)
+        if entry is None:
+            flask.g.response_cache_key = key
+            return None
+        return respond(cache, entry)
+
+    @app.server.after_request
+    def store_response(response):
+        key = flask.g.pop('response_cache_key', None)
+        if key is None or response.status_code != 200 or response.direct_passthrough:
+            return response
+        body = response.get_data()
+        entry = Entry(key=key, tag=f'{key[0]}-{hashlib.sha1(body).hexdigest()[:16]}', mimetype=response.mimetype,
+                      bodies={None: body})
+        cache.put(entry)
+        return respond(cache, entry)
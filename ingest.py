@@ -0,0 +1,205 @@
+"""
+Columnar storage for the Our World in Data dataset.
+The raw CSV is streamed in chunks and converted once per snapshot into an uncompressed Feather file with typed
+columns (categorical location, datetime date, float32 metrics where the values fit) sorted by location. The row range
+of every location is kept in the file metadata, so loading a subset of columns and/or locations is a memory-mapped,
+mostly zero-copy read instead of a full CSV parse. Since the columns stay backed by the file, every process loading
+it (e.g. the gunicorn workers) shares the same pages of the page cache. When a new snapshot only appended rows to the
+CSV the store was built from, only those rows are parsed and merged into the existing store.
+"""
+import io
+import os
+import json
+import hashlib
+import logging
+import pathlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas.api.types import union_categoricals
+import snapshot
+
+
+logger = logging.getLogger(__name__)
+
+OWID_COLUMNS = ['location', 'date', 'total_cases', 'new_cases', 'total_deaths', 'new_deaths', 'new_tests',
+                'total_vaccinations', 'people_vaccinated', 'people_fully_vaccinated', 'new_vaccinations', 'population']
+
+LOCATIONS_METADATA_KEY = b'locations'
+SOURCE_SIZE_METADATA_KEY = b'source_size'
+
+# Rows parsed at once while converting the CSV, which bounds the memory used by the parser
+CHUNK_SIZE = int(os.environ.get('OWID_CHUNK_SIZE', 100000))
+
+
+def downcast(values):
+    """Store a float column as float32 when that does not change any of its values."""
+    narrow = values.astype('float32')
+    if np.array_equal(narrow.astype('float64'), values, equal_nan=True):
+        return narrow
+    return values
+
+
+def csv_tail(csv_path, offset):
+    """File-like object with the header of a CSV file followed by its rows from byte `offset` onwards."""
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        return io.BytesIO(header + f.read())
+
+
+def merge_latest(latest, newer):
+    """Latest non-null values per location, with the values of `newer` taking precedence over `latest`."""
+    newer = newer.groupby('location', observed=True, sort=False).last()
+    newer.index = newer.index.astype(str)
+    return newer if latest is None else newer.combine_first(latest)
+
+
+def finish_latest(latest, frame):
+    latest = latest.sort_index().astype(frame.dtypes.drop('location')).rename_axis('location').reset_index()
+    latest['location'] = pd.Categorical(latest['location'], categories=frame['location'].cat.categories)
+    return latest
+
+
+def concat_owid(frames):
+    locations = union_categoricals([frame.pop('location') for frame in frames], sort_categories=True)
+    frame = pd.concat(frames, ignore_index=True)
+    frame.insert(0, 'location', locations)
+    return frame
+
+
+def read_owid_chunks(csv_path, columns=OWID_COLUMNS, chunksize=CHUNK_SIZE):
+    """Parse the CSV `chunksize` rows at a time, keeping only `columns` and downcasting every chunk."""
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype={'location': 'category'}, parse_dates=['date'],
+                             chunksize=chunksize):
+        for column in chunk.columns.drop(['location', 'date'], errors='ignore'):
+            chunk[column] = downcast(chunk[column].to_numpy(dtype='float64'))
+        yield chunk
+
+
+def read_owid_csv(csv_path, columns=OWID_COLUMNS, chunksize=CHUNK_SIZE):
+    """
+    Stream the OWID CSV into its typed time series and the latest non-null values of every location.
+    The latest table is built chunk by chunk and is identical to `frame.groupby('location').last().reset_index()`.
+    Only one raw chunk is parsed at a time, but the downcast chunks are then concatenated into a single frame, so the
+    peak memory is still about twice the typed frame (though well below a parse of the whole CSV).
+    """
+    chunks = []
+    latest = None
+    for chunk in read_owid_chunks(csv_path, columns, chunksize):
+        latest = merge_latest(latest, chunk)
+        chunks.append(chunk)
+
+    frame = concat_owid(chunks)
+    return frame, finish_latest(latest, frame)
+
+
+def append_owid(feather_path, tail_csv):
+    """
+    Append the rows of `tail_csv` to the data stored in `feather_path`, without parsing the rest of the CSV again.
+    Rows that are not newer than the last date already ingested for their location are skipped.
+    """
+    frame = feather.read_table(feather_path).to_pandas()
+    latest = feather.read_feather(latest_path_for(feather_path)).set_index('location')
+    latest.index = latest.index.astype(str)
+
+    tail = concat_owid(list(read_owid_chunks(tail_csv, columns=list(frame.columns))))
+    last_dates = tail['location'].astype(str).map(latest['date']).fillna(pd.Timestamp.min)
+    tail = tail[tail['date'].to_numpy() > last_dates.to_numpy()]
+    logger.info('Appending %d new rows to %s', len(tail), feather_path)
+
+    latest = merge_latest(latest, tail)
+    frame = concat_owid([frame, tail])
+    return frame, finish_latest(latest, frame)
+
+
+def location_ranges(frame):
+    """Row range [start, stop) of every location of a location-sorted frame."""
+    codes = frame['location'].cat.codes.to_numpy()
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], boundaries])
+    stops = np.concatenate([boundaries, [len(codes)]])
+    names = frame['location'].cat.categories[codes[starts]] if len(codes) else []
+    return {name: (int(start), int(stop)) for name, start, stop in zip(names, starts, stops)}
+
+
+def latest_path_for(feather_path):
+    return feather_path.with_name(feather_path.name.replace('.feather', '-latest.feather'))
+
+
+def write_owid_feather(frame, latest, feather_path, source_size=None):
+    # The upstream CSV is already sorted by location, sorting it again would hold a second copy of every column
+    if not frame['location'].cat.codes.is_monotonic_increasing:
+        frame = frame.sort_values('location', kind='mergesort').reset_index(drop=True)
+    # Metrics keep NaN as a value instead of a null and every column is a single chunk, which lets the memory-mapped
+    # columns be handed to pandas without copying them
+    arrays = [pa.array(frame[column]) if column in ('location', 'date') else
+              pa.array(frame[column].to_numpy(), from_pandas=False) for column in frame.columns]
+    table = pa.Table.from_arrays(arrays, names=list(frame.columns)).combine_chunks()
+    table = table.replace_schema_metadata({
+        LOCATIONS_METADATA_KEY: json.dumps(location_ranges(frame)).encode('utf-8'),
+        SOURCE_SIZE_METADATA_KEY: str(source_size).encode('utf-8')
+    })
+
+    tmp_path = feather_path.with_name(feather_path.name + '.part')
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(len(table), 1))
+    latest_tmp_path = latest_path_for(feather_path).with_name(latest_path_for(feather_path).name + '.part')
+    feather.write_feather(latest, latest_tmp_path, compression='uncompressed')
+    os.replace(latest_tmp_path, latest_path_for(feather_path))
+    os.replace(tmp_path, feather_path)
+
+
+def feather_path_for(csv_path):
+    csv_path = pathlib.Path(csv_path).resolve()
+    # Stores converted with another set of columns are not reused
+    digest = hashlib.sha1('\n'.join([str(csv_path)] + OWID_COLUMNS).encode('utf-8')).hexdigest()[:12]
+    return snapshot.CACHE_DIR.joinpath(f'{digest}-{csv_path.stem}.feather')
+
+
+def convert_owid(csv_path, feather_path=None):
+    """Convert the OWID CSV into its Feather file, unless the file is already up to date."""
+    feather_path = pathlib.Path(feather_path) if feather_path is not None else feather_path_for(csv_path)
+    feather_path.parent.mkdir(parents=True, exist_ok=True)
+    with snapshot.locked(feather_path):
+        if feather_path.exists() and feather_path.stat().st_mtime >= pathlib.Path(csv_path).stat().st_mtime:
+            return feather_path
+
+        # Only the appended rows are parsed when the snapshot grew from the CSV the store was built from
+        offset = snapshot.appended_from(csv_path)
+        if offset is not None and feather_path.exists() and stored_source_size(feather_path) == offset:
+            tables = append_owid(feather_path, csv_tail(csv_path, offset))
+        else:
+            logger.info('Converting %s into %s', csv_path, feather_path)
+            tables = read_owid_csv(csv_path)
+        write_owid_feather(*tables, feather_path, source_size=pathlib.Path(csv_path).stat().st_size)
+    return feather_path
+
+
+def stored_source_size(feather_path):
+    metadata = feather.read_table(feather_path, columns=[], memory_map=True).schema.metadata or {}
+    size = metadata.get(SOURCE_SIZE_METADATA_KEY, b'None')
+    return int(size) if size.isdigit() else None
+
+
+def load_owid(csv_path, columns=None, locations=None):
+    """
+    Load the OWID data, converting the CSV snapshot first if needed.
+    Only the requested columns are read, and with `locations` only the row ranges of those locations.
+    """
+    table = feather.read_table(convert_owid(csv_path), columns=columns, memory_map=True)
+
+    if locations is not None:
+        ranges = json.loads(table.schema.metadata[LOCATIONS_METADATA_KEY])
+        slices = [table.slice(start, stop - start) for start, stop in
+                  sorted(ranges[location] for location in locations if location in ranges)]
+        table = pa.concat_tables(slices) if slices else table.slice(0, 0)
+
+    # One block per column keeps the numeric columns as read-only views over the memory map, so processes loading
+    # the same file share its pages instead of each holding a private copy
+    return table.to_pandas(split_blocks=True)
+
+
+def load_owid_latest(csv_path):
+    """Latest non-null values of every location, as computed while converting the CSV."""
+    return feather.read_feather(latest_path_for(convert_owid(csv_path)))
@@ -0,0 +1,141 @@
+"""
+Prometheus-style instrumentation of the dashboard, exposed in the text exposition format on `/metrics`.
+Set `METRICS_ENABLED=1` to collect them. When disabled the hooks are not installed and `observe` returns right away,
+so the instrumented code paths only pay for a flag check. Every gunicorn worker keeps its own metrics.
+"""
+import os
+import time
+import bisect
+import threading
+import flask
+
+
+ENABLED = os.environ.get('METRICS_ENABLED', '0') != '0'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def escape(value):
+    """Label value escaped as the text exposition format requires."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.series.get(labels)
+            if counts is None:
+                # Per bucket counts, then the count and the sum of the observations
+                counts = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {labels: list(counts) for labels, counts in self.series.items()}
+        for labels, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames + ('le',), labels + (bound,))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {counts[-1]}')
+        return lines
+
+
+class Collected:
+    """Gauge or counter whose samples are read by `collect()` at scrape time, which costs nothing in between."""
+
+    def __init__(self, name, documentation, kind, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in self.collect():
+            lines.append(f'{self.name}{format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+CALLBACK_SECONDS = Histogram('dashboard_callback_seconds',
+                             'Time to answer a callback request, including serialization.', ('output',))
+CALLBACK_BYTES = Histogram('dashboard_callback_response_bytes', 'Size of the callback responses sent.', ('output',),
+                           buckets=SIZE_BUCKETS)
+LAYOUT_SECONDS = Histogram('dashboard_layout_seconds', 'Time to answer a layout request.')
+SOURCE_FETCH_SECONDS = Histogram('dashboard_source_fetch_seconds', 'Time to fetch a data source.', ('source',))
+SOURCE_PARSE_SECONDS = Histogram('dashboard_source_parse_seconds', 'Time to parse a data source.', ('source',))
+LOAD_SECONDS = Histogram('dashboard_snapshot_load_seconds', 'Time to build a new data snapshot.')
+
+REGISTRY = [CALLBACK_SECONDS, CALLBACK_BYTES, LAYOUT_SECONDS, SOURCE_FETCH_SECONDS, SOURCE_PARSE_SECONDS, LOAD_SECONDS]
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def install(app):
+    """Time the layout and callback requests of the Dash `app` and serve the metrics on `/metrics`."""
+    if not ENABLED:
+        return
+    prefix = app.config.routes_pathname_prefix
+    layout_path, callback_path = prefix + '_dash-layout', prefix + '_dash-update-component'
+
+    # Installed before the response cache, so its hits and the compression it does are part of the timings
+    @app.server.before_request
+    def start_timer():
+        if flask.request.path in (layout_path, callback_path):
+            flask.g.metrics_start = time.perf_counter()
+
+    @app.server.after_request
+    def observe_response(response):
+        start = flask.g.pop('metrics_start', None)
+        if start is None:
+            return response
+        if flask.request.path == layout_path:
+            LAYOUT_SECONDS.observe(time.perf_counter() - start)
+            return response
+        # The output comes from the request body, only the outputs of the app are used as labels so clients can
+        # neither forge series nor create an unbounded number of them
+        output = (flask.request.get_json(silent=True) or {}).get('output')
+        if response.status_code != 200 or not isinstance(output, str) or output not in app.callback_map:
+            output = 'other'
+        CALLBACK_SECONDS.observe(time.perf_counter() - start, output)
+        if not response.direct_passthrough:
+            CALLBACK_BYTES.observe(response.content_length or 0, output)
+        return response
+
+    @app.server.route('/metrics')
+    def serve_metrics():
+        return flask.Response(render(), mimetype='text/plain; version=0.0.4')
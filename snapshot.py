@@ -0,0 +1,303 @@
+"""
+Local on-disk snapshot cache for the remote data sources.
+Each source is stored once in the cache directory together with the ETag/Last-Modified headers returned by the
+server, so later fetches (by any gunicorn worker) are conditional requests that usually end in a 304. Files that
+only grew are refreshed by downloading their tail, and the snapshot records where the appended data starts so it can
+be ingested incrementally. When the network is unavailable the last snapshot on disk is served instead. Synthetic
+sources (see fixtures.py) are generated into the cache directory the first time they are fetched.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import pathlib
+import requests
+import requests.adapters
+from typing import NamedTuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+try:
+    import fcntl
+except ImportError:  # Windows, only used for local development
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = pathlib.Path(os.environ.get('DATA_CACHE_DIR', pathlib.Path(__file__).parent.joinpath('.data_cache')))
+
+# Snapshots younger than this (in seconds) are served without revalidating them against the server
+MAX_AGE = float(os.environ.get('DATA_CACHE_MAX_AGE', 600))
+
+CHUNK_SIZE = 1 << 20
+
+# Snapshots are refreshed by only requesting their tail with a Range request, starting this many bytes before the end
+# of the previous snapshot so the overlap can be checked against it
+RANGE_REQUESTS = os.environ.get('DATA_RANGE_REQUESTS', '1') != '0'
+RANGE_OVERLAP = 4096
+# The tail check cannot see edits before the overlap, so a full download is forced at least this often (in seconds)
+RANGE_MAX_AGE = float(os.environ.get('DATA_RANGE_MAX_AGE', 86400))
+
+
+def snapshot_name(url):
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+    return f"{digest}-{pathlib.PurePosixPath(urlparse(url).path).name or 'index'}"
+
+
+def read_metadata(path):
+    try:
+        with open(path.with_name(path.name + '.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_metadata(path, metadata):
+    meta_path = path.with_name(path.name + '.json')
+    tmp_path = meta_path.with_name(meta_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f)
+    os.replace(tmp_path, meta_path)
+
+
+@contextmanager
+def locked(path):
+    """Serialize fetches of the same source across worker processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_session(pool_size=8):
+    """HTTP session with a connection pool large enough for fetching every source at once."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch(url, cache_dir=None, max_age=None, timeout=30, session=None, retries=0, backoff=1.0, use_range=True):
+    """
+    Return a local path holding the latest available copy of `url`.
+    Local paths and file:// urls are returned as they are, synthetic: urls are generated once into the cache (see
+    fixtures.py) and everything else goes through the snapshot cache. Failed requests are retried `retries` times,
+    waiting `backoff` seconds doubled after every attempt. `use_range=False` always downloads the whole file.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ('', 'file'):
+        return pathlib.Path(url2pathname(parsed.path) if parsed.scheme else url)
+
+    cache_dir = pathlib.Path(cache_dir if cache_dir is not None else CACHE_DIR)
+    max_age = MAX_AGE if max_age is None else max_age
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir.joinpath(snapshot_name(url))
+
+    if parsed.scheme == 'synthetic':
+        return generate(url, path)
+
+    with locked(path):
+        metadata = read_metadata(path)
+        if not path.exists():
+            metadata = {}
+
+        if metadata and time.time() - metadata.get('checked_at', 0) < max_age:
+            return path
+
+        headers = {}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            headers['If-Modified-Since'] = metadata['last_modified']
+
+        for attempt in range(retries + 1):
+            try:
+                metadata = download(url, path, metadata, headers, timeout, session,
+                                    use_range=use_range and RANGE_REQUESTS)
+                break
+            except requests.RequestException:
+                if attempt < retries:
+                    logger.warning('Fetching %s failed, retrying (%d/%d)', url, attempt + 1, retries)
+                    time.sleep(backoff * 2 ** attempt)
+                elif not metadata:
+                    raise
+                else:
+                    logger.warning('Could not reach %s, serving snapshot from %s', url, path, exc_info=True)
+                    return path
+
+        metadata['checked_at'] = time.time()
+        write_metadata(path, metadata)
+
+    return path
+
+
+def generate(url, path):
+    """Write the synthetic source of `url` into `path` unless it was already generated, the same url never changes."""
+    import fixtures
+
+    with locked(path):
+        if not path.exists():
+            start = time.perf_counter()
+            tmp_path = path.with_name(path.name + '.part')
+            fixtures.write_url(url, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info('Generated %s in %.2fs (%d bytes)', url, time.perf_counter() - start, path.stat().st_size)
+    return path
+
+
+def is_prefix(path, other_path, size):
+    """Whether the first `size` bytes of `other_path` are the content of `path`."""
+    with open(path, 'rb') as f, open(other_path, 'rb') as other:
+        while size > 0:
+            chunk = f.read(min(CHUNK_SIZE, size))
+            if not chunk or chunk != other.read(len(chunk)):
+                return False
+            size -= len(chunk)
+    return True
+
+
+def write_tail(path, tmp_path, response, size):
+    """
+    Write the snapshot extended with the tail served by a 206 response into `tmp_path`.
+    Returns False when the overlapping bytes do not match the snapshot, i.e. the remote file did not only grow.
+    """
+    chunks = response.iter_content(CHUNK_SIZE)
+    overlap = b''
+    for chunk in chunks:
+        overlap += chunk
+        if len(overlap) >= RANGE_OVERLAP:
+            break
+
+    with open(path, 'rb') as f:
+        f.seek(size - RANGE_OVERLAP)
+        if overlap[:RANGE_OVERLAP] != f.read(RANGE_OVERLAP):
+            return False
+
+    shutil.copyfile(path, tmp_path)
+    with open(tmp_path, 'ab') as f:
+        f.write(overlap[RANGE_OVERLAP:])
+        for chunk in chunks:
+            f.write(chunk)
+    return True
+
+
+def download(url, path, metadata, headers, timeout, session, use_range=RANGE_REQUESTS):
+    """
+    Conditional GET of `url` into `path`, returning the metadata of the snapshot.
+    When there is a previous snapshot only its tail is requested with a Range request, and `appended_from` in the
+    metadata records the size of the previous snapshot whenever the new one only appended data to it.
+    """
+    size = path.stat().st_size if metadata else 0
+    full_fetched_at = metadata.get('full_fetched_at', 0) if metadata else 0
+    request_headers = dict(headers)
+    if use_range and size > RANGE_OVERLAP and time.time() - full_fetched_at < RANGE_MAX_AGE:
+        request_headers['Range'] = f'bytes={size - RANGE_OVERLAP}-'
+        request_headers['Accept-Encoding'] = 'identity'
+
+    response = (session or requests).get(url, headers=request_headers, timeout=timeout, stream=True)
+    with response:
+        if response.status_code == 304 and metadata:
+            logger.info('%s not modified, using snapshot %s', url, path)
+            return metadata
+
+        if response.status_code == 416 and 'Range' in request_headers:
+            # The file is now shorter than the snapshot, so the tail starts past its end
+            logger.info('%s shrank below its snapshot, fetching it again', url)
+            return download(url, path, metadata, headers, timeout, session, use_range=False)
+
+        response.raise_for_status()
+        tmp_path = path.with_name(path.name + '.part')
+        if response.status_code == 206:
+            # A file that changed without growing was edited in place, which the tail alone cannot tell
+            content_range = re.fullmatch(r'bytes (\d+)-\d+/(\d+)', response.headers.get('Content-Range', ''))
+            if not content_range or int(content_range.group(1)) != size - RANGE_OVERLAP or \
+                    int(content_range.group(2)) <= size or not write_tail(path, tmp_path, response, size):
+                logger.info('%s changed before its tail, fetching it again', url)
+                return download(url, path, metadata, headers, timeout, session, use_range=False)
+            appended_from = size
+        else:
+            full_fetched_at = time.time()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+            appended_from = size if size and is_prefix(path, tmp_path, size) else None
+        os.replace(tmp_path, path)
+
+    metadata = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time(),
+        'size': path.stat().st_size,
+        'appended_from': appended_from,
+        'full_fetched_at': full_fetched_at
+    }
+    logger.info('Fetched %s (%d bytes, appended from %s)', url, metadata['size'], appended_from)
+    return metadata
+
+
+def appended_from(path):
+    """
+    Size of the previous snapshot of `path` when the latest fetch only appended data to it, None otherwise.
+    Local files are not tracked and always return None.
+    """
+    metadata = read_metadata(pathlib.Path(path))
+    if metadata.get('size') != pathlib.Path(path).stat().st_size:
+        return None
+    return metadata.get('appended_from')
+
+
+class Source(NamedTuple):
+    url: str
+    timeout: float = 30
+    retries: int = 2
+    # Whether the tail of the file is requested with a Range request, off for files known to change before their tail
+    range_requests: bool = True
+
+
+class Fetched(NamedTuple):
+    path: pathlib.Path
+    seconds: float
+
+
+def fetch_all(sources, max_workers=None, **kwargs):
+    """
+    Fetch a dict of name -> Source concurrently over a pooled session.
+    Returns a dict of name -> Fetched with the local path and the time taken by every source.
+    """
+    session = create_session(pool_size=max(len(sources), 1))
+
+    def timed_fetch(source):
+        start = time.perf_counter()
+        path = fetch(source.url, timeout=source.timeout, retries=source.retries, session=session,
+                     use_range=source.range_requests, **kwargs)
+        return Fetched(path, time.perf_counter() - start)
+
+    with session, ThreadPoolExecutor(max_workers=max_workers or len(sources) or 1) as executor:
+        futures = {name: executor.submit(timed_fetch, source) for name, source in sources.items()}
+        fetched = {name: future.result() for name, future in futures.items()}
+
+    for name, result in fetched.items():
+        logger.info('Source %s ready in %.2fs', name, result.seconds)
+    return fetched
+
+
+def version(*paths):
+    """Token that changes whenever the content of any of the given snapshots changes."""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = pathlib.Path(path).stat()
+        digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return digest.hexdigest()[:16]
@@ -0,0 +1,134 @@
+"""
+The clientside callbacks of assets/clientside.js against the server callbacks they replaced. The old callbacks are
+kept here as they were, the JS functions are run with node over every combination of their inputs.
+"""
+import copy
+import json
+import shutil
+import pathlib
+import textwrap
+import itertools
+import subprocess
+import pytest
+import windowing
+
+CLIENTSIDE_JS = pathlib.Path(__file__).resolve().parent.parent.joinpath('assets', 'clientside.js')
+
+DATA_SOURCES = ['Confirmed Cases', 'Reported Deaths', 'Recovered Cases']
+TIME_FRAMES = ['Weekly', 'Daily']
+TIME_WINDOWS = list(windowing.PRESETS) + [windowing.CUSTOM]
+CLICK_DATA = [None, {'points': [{'hovertext': 'Portugal'}]}, {'points': [{'hovertext': "Côte d'Ivoire"}]}]
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+def update_app_name(val, val_last_time):
+    return f"SARS-CoV-2\n{val} ({val_last_time})"
+
+
+def update_data_description(val, val_time):
+    if val_time == 'Weekly':
+        time_window = 'week'
+    else:
+        time_window = 'day'
+
+    # Returned as dcc.Markdown(text), which dedents it
+    text = f'''
+                The interactive graph displayed to the right shows the trajectory of the number of new **{val}** by
+                *SARS-CoV-2* in the past {time_window} as a function of the total number of **{val}**. If viewed with a
+                weekly rate of change, the exponential behaviour is observed as a straight line and, in case the disease
+                is being beaten, the curve with start to round off at the top and will start to travel with a downwards
+                trend that will be visible as a sudden drop. Note that the graph is not plotted over time, but instead over
+                the total number of **{val}**, therefore, it plots the rate of change over the last {time_window}. Time is
+                shown in each data point with the corresponding day. Below the main figure, the data over time is also
+                present. Hover over the graphs for more information. For more information concerning statistics and
+                research about *COVID-19* please visit this [page](https://ourworldindata.org/coronavirus). Sources:
+                Portugal data from [*Data Science for Social Good Portugal*](https://github.com/dssg-pt/covid19pt-data).
+                Country level data from [*Our World in Data*](https://github.com/owid/covid-19-data/tree/master/public/data).
+                Application's [source code](https://github.com/dvpinho/covid19dashboard).
+                '''
+    return textwrap.dedent(text).strip()
+
+
+def update_graph_2_labels(graph_title, val_time, last_data):
+    if val_time == 'Weekly':
+        return f'Average number of new {graph_title} per day in the previous week ({last_data})'
+    else:
+        return f'Cumulative {graph_title} ({last_data})'
+
+
+def update_graph_3_title(click_data):
+    if click_data is not None:
+        click_name = click_data['points'][0]['hovertext']
+        return f'Confirmed cases in {click_name}'
+    else:
+        return 'Click on a map region to show the confirmed cases over time'
+
+
+def with_scale(axes):
+    # The graph callbacks set 'type': 'log' if toggle else 'linear' on these axes of their figures
+    def build(figure, toggle):
+        figure = copy.deepcopy(figure)
+        for axis in axes:
+            figure['layout'].setdefault(axis, {})['type'] = 'log' if toggle else 'linear'
+        return figure
+    return build
+
+
+FIGURE = {
+    'data': [{'type': 'scatter', 'x': ['2021-01-01', '2021-01-02'], 'y': [1, 2], 'mode': 'lines+markers'}],
+    'layout': {'margin': {'t': 30}, 'xaxis': {'title': 'Total', 'zeroline': False}, 'yaxis': {'zeroline': False},
+               'plot_bgcolor': '#2b2b2b'}
+}
+# The country graph figure had no x axis settings besides the zero line
+FIGURE_WITHOUT_XAXIS = {'data': FIGURE['data'], 'layout': {'yaxis': {'title': 'Confirmed Cases'}}}
+
+CASES = (
+    [('appName', args, update_app_name(*args)) for args in itertools.product(DATA_SOURCES, TIME_WINDOWS)] +
+    [('dataDescription', args, update_data_description(*args))
+     for args in itertools.product(DATA_SOURCES, TIME_FRAMES)] +
+    [('graph2Title', args, update_graph_2_labels(*args))
+     for args in itertools.product(DATA_SOURCES, TIME_FRAMES, TIME_WINDOWS)] +
+    [('graph3Title', (click_data,), update_graph_3_title(click_data)) for click_data in CLICK_DATA] +
+    [(name, (figure, toggle), with_scale(axes)(figure, toggle))
+     for name, axes in (('logBothAxes', ['xaxis', 'yaxis']), ('logYAxis', ['yaxis']))
+     for figure in (FIGURE, FIGURE_WITHOUT_XAXIS) for toggle in (True, False)]
+)
+
+RUNNER = '''
+global.window = {dash_clientside: {no_update: {no_update: true}}};
+require(process.argv[1]);
+const functions = window.dash_clientside.dashboard;
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf-8'));
+const results = cases.map(function (item) {
+    const args = JSON.parse(JSON.stringify(item[1]));
+    const result = functions[item[0]].apply(null, args);
+    // The inputs must not be mutated, Dash keeps them in its store
+    return [result, JSON.stringify(args) === JSON.stringify(item[1])];
+});
+process.stdout.write(JSON.stringify(results));
+'''
+
+
+def run_clientside(cases):
+    output = subprocess.run(['node', '-e', RUNNER, str(CLIENTSIDE_JS)], input=json.dumps(cases), capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output)
+
+
+@pytest.fixture(scope='module')
+def results():
+    return run_clientside([[name, list(args)] for name, args, _ in CASES])
+
+
+@pytest.mark.parametrize('index', range(len(CASES)), ids=lambda index: f'{CASES[index][0]}-{index}')
+def test_same_output(results, index):
+    name, args, expected = CASES[index]
+    result, unchanged_inputs = results[index]
+    assert result == expected
+    assert unchanged_inputs
+
+
+def test_scale_without_figure():
+    results = run_clientside([['logBothAxes', [None, True]], ['logYAxis', [None, False]]])
+    assert [result for result, _ in results] == [{'no_update': True}] * 2
@@ -0,0 +1,99 @@
+"""
+Downsampling keeps the visual extremes of a series: the first and last points and the minimum and maximum of every
+bucket, within the point budget. `minmax_indices` is also checked against the np.array_split loop it replaced.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import downsample
+
+
+def old_minmax_indices(y, budget):
+    y = np.asarray(y, dtype='float64')
+    buckets = np.array_split(np.arange(1, len(y) - 1), max((budget - 2) // 2, 1))
+    keep = [0, len(y) - 1]
+    for bucket in buckets:
+        values = y[bucket]
+        if len(bucket) and not np.isnan(values).all():
+            keep.extend((bucket[np.nanargmin(values)], bucket[np.nanargmax(values)]))
+    return np.unique(keep)
+
+
+def spiky_series(seed, length):
+    """A random walk with isolated spikes and dips, ties and runs of NaN."""
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(0, 1, length)).round(1)
+    spikes = rng.choice(length, 10, replace=False)
+    y[spikes] += rng.choice([-1, 1], 10) * 1000
+    for start in rng.choice(length - 50, 3, replace=False):
+        y[start:start + rng.integers(1, 50)] = np.nan
+    return y
+
+
+SERIES = [spiky_series(seed, length) for seed, length in enumerate([500, 1000, 1001, 2400, 5000])]
+BUDGETS = [4, 5, 10, 51, 400]
+
+
+@pytest.mark.parametrize('budget', BUDGETS)
+@pytest.mark.parametrize('y', SERIES, ids=lambda y: str(len(y)))
+def test_minmax_matches_array_split_loop(y, budget):
+    np.testing.assert_array_equal(downsample.minmax_indices(y, budget), old_minmax_indices(y, budget))
+
+
+@pytest.mark.parametrize('budget', BUDGETS)
+@pytest.mark.parametrize('y', SERIES, ids=lambda y: str(len(y)))
+def test_minmax_keeps_extremes(y, budget):
+    indices = downsample.minmax_indices(y, budget)
+    assert len(indices) <= budget
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert (np.diff(indices) > 0).all()
+    kept = set(indices.tolist())
+    # The global extremes
+    assert np.nanargmin(y) in kept and np.nanargmax(y) in kept
+    # The extremes of every bucket that has values
+    for bucket in np.array_split(np.arange(1, len(y) - 1), max((budget - 2) // 2, 1)):
+        values = y[bucket]
+        if len(bucket) and not np.isnan(values).all():
+            assert np.nanmin(values) in y[[index for index in bucket if index in kept]]
+            assert np.nanmax(values) in y[[index for index in bucket if index in kept]]
+
+
+def test_minmax_keeps_spikes():
+    y = np.zeros(10000)
+    y[[1234, 5678]] = 1e6
+    y[[4321, 8765]] = -1e6
+    y[6000:8000] = np.nan
+    indices = downsample.minmax_indices(y, 100)
+    assert {1234, 5678, 4321, 8765, 0, 9999} <= set(indices.tolist())
+    assert not np.isnan(y[indices[1:-1]]).any()
+
+
+def test_minmax_all_nan():
+    y = np.full(1000, np.nan)
+    np.testing.assert_array_equal(downsample.minmax_indices(y, 100), [0, 999])
+
+
+@pytest.mark.parametrize('method', list(downsample.METHODS))
+@pytest.mark.parametrize('budget', [10, 400])
+def test_downsample_within_budget(method, budget):
+    y = spiky_series(7, 3000)
+    dates = pd.Series(pd.date_range('2020-01-01', periods=len(y)))
+    values, days = downsample.downsample(y, dates, budget=budget, method=method)
+    assert len(values) == len(days) <= budget
+    assert days.iloc[0] == dates.iloc[0] and days.iloc[-1] == dates.iloc[-1]
+    assert days.dtype == dates.dtype
+    if method == 'minmax':
+        assert np.nanmax(values) == np.nanmax(y) and np.nanmin(values) == np.nanmin(y)
+
+
+def test_downsample_short_series_untouched():
+    y = np.arange(50.0)
+    x = np.arange(50)
+    values, days = downsample.downsample(y, x, budget=400)
+    assert values is y and days is x
+
+
+def test_downsample_disabled():
+    y = np.arange(5000.0)
+    (values,) = downsample.downsample(y, budget=0)
+    assert values is y
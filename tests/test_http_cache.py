@@ -0,0 +1,73 @@
+"""
+The response cache: an ETag per snapshot, body and content coding, 304 revalidation, and the bound on the bytes of
+the cached bodies.
+"""
+import dash
+import dash_html_components as html
+import pytest
+import http_cache
+
+
+@pytest.fixture
+def app():
+    app = dash.Dash(__name__)
+    app.layout = html.Div('x' * 10000)
+    app.version = 'v1'
+    app.response_cache = http_cache.ResponseCache()
+    http_cache.install(app, lambda: app.version, app.response_cache)
+    return app
+
+
+def get_layout(app, encoding, etag=None):
+    headers = {'Accept-Encoding': encoding}
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    return app.server.test_client().get('/_dash-layout', headers=headers)
+
+
+def test_etag_per_coding(app):
+    responses = {encoding: get_layout(app, encoding) for encoding in ('br', 'gzip', 'identity')}
+    etags = {encoding: response.headers['ETag'] for encoding, response in responses.items()}
+    assert len(set(etags.values())) == 3
+    assert responses['gzip'].headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in responses['identity'].headers
+    assert all(etag.startswith('"v1-') for etag in etags.values())
+
+
+def test_not_modified(app):
+    etag = get_layout(app, 'gzip').headers['ETag']
+    assert get_layout(app, 'gzip', etag).status_code == 304
+    # The validator of the gzip body does not match the brotli one
+    assert get_layout(app, 'br', etag).status_code == 200
+    app.version = 'v2'
+    assert get_layout(app, 'gzip', etag).status_code == 200
+
+
+def test_compressed_bodies_are_counted(app):
+    cache = app.response_cache
+    get_layout(app, 'identity')
+    identity_bytes = cache.nbytes
+    get_layout(app, 'gzip')
+    get_layout(app, 'br')
+    assert cache.nbytes == sum(entry.nbytes for entry in cache.entries.values()) > identity_bytes
+
+
+def test_bounded_by_bytes(app):
+    cache = app.response_cache
+    get_layout(app, 'identity')
+    cache.maxbytes = cache.nbytes * 2
+    for version in ('v2', 'v3', 'v4'):
+        app.version = version
+        get_layout(app, 'identity')
+    assert [key[0] for key in cache.entries] == ['v3', 'v4']
+    assert cache.nbytes <= cache.maxbytes
+    cache.retain('v4')
+    assert cache.nbytes == sum(entry.nbytes for entry in cache.entries.values())
+
+
+def test_disabled(app):
+    cache = app.response_cache
+    cache.maxbytes = 0
+    assert get_layout(app, 'gzip').status_code == 200
+    assert get_layout(app, 'gzip').status_code == 200
+    assert not cache.entries and cache.nbytes == 0
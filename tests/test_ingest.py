@@ -0,0 +1,63 @@
+"""
+The OWID store: the latest table streamed chunk by chunk matches a groupby over the whole frame, and a store extended
+with the rows appended to the CSV matches one converted from the whole CSV.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import ingest
+import snapshot
+
+
+HEADER = ','.join(ingest.OWID_COLUMNS) + '\n'
+
+
+def owid_rows(locations, start, days, seed):
+    """Rows of `days` days from `start` for every location, with runs of missing values at the end of some columns."""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for number, location in enumerate(locations):
+        for day in pd.date_range(start, periods=days).strftime('%Y-%m-%d'):
+            values = [float(value) if rng.random() > 0.2 else '' for value in rng.integers(0, 1000, 10)]
+            lines.append(','.join([location, day] + [str(value) for value in values]))
+        # The last days of some locations have no deaths or vaccinations at all
+        if number % 2:
+            for day in pd.date_range(start, periods=days + 3)[days:].strftime('%Y-%m-%d'):
+                lines.append(f'{location},{day},{number},{number},,,,,,,,')
+    return '\n'.join(lines) + '\n'
+
+
+LOCATIONS = ['Albania', 'Brazil', 'Chile', 'Portugal', 'Spain', 'World']
+
+
+@pytest.mark.parametrize('chunksize', [1, 7, 1000])
+def test_latest_matches_groupby(tmp_path, chunksize):
+    csv_path = tmp_path.joinpath('owid.csv')
+    csv_path.write_text(HEADER + owid_rows(LOCATIONS, '2021-01-01', 20, seed=chunksize))
+    frame, latest = ingest.read_owid_csv(csv_path, chunksize=chunksize)
+    expected = frame.groupby('location').last().reset_index()
+    pd.testing.assert_frame_equal(latest, expected)
+
+
+def test_append_matches_full_conversion(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'CACHE_DIR', tmp_path)
+    csv_path = tmp_path.joinpath('owid.csv')
+    head = HEADER + owid_rows(LOCATIONS, '2021-01-01', 20, seed=1)
+    csv_path.write_text(head)
+    feather_path = ingest.convert_owid(csv_path, tmp_path.joinpath('appended.feather'))
+
+    # New days for every location and a location that was not there before, appended at the end of the file
+    csv_path.write_text(head + owid_rows(LOCATIONS + ['Zambia'], '2021-01-24', 5, seed=2))
+    snapshot.write_metadata(csv_path, {'size': csv_path.stat().st_size, 'appended_from': len(head)})
+    os.utime(feather_path, (0, 0))
+    with monkeypatch.context() as patch:
+        patch.setattr(ingest, 'read_owid_csv', None)
+        assert ingest.convert_owid(csv_path, feather_path) == feather_path
+
+    full_path = tmp_path.joinpath('full.feather')
+    ingest.write_owid_feather(*ingest.read_owid_csv(csv_path), full_path)
+    pd.testing.assert_frame_equal(pd.read_feather(feather_path), pd.read_feather(full_path))
+    pd.testing.assert_frame_equal(pd.read_feather(ingest.latest_path_for(feather_path)),
+                                  pd.read_feather(ingest.latest_path_for(full_path)))
+    assert ingest.stored_source_size(feather_path) == csv_path.stat().st_size
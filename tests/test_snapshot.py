@@ -0,0 +1,194 @@
+"""
+The conditional and Range requests of snapshot.fetch against a local HTTP server: 304 revalidation, appending a tail
+served with 206, the fallbacks to a full download when the file was edited, shrank or the server ignores Range, and
+serving the last snapshot when the server is unreachable.
+"""
+import hashlib
+import threading
+import http.server
+import pytest
+import requests
+import snapshot
+
+
+def rows(start, stop):
+    return ''.join(f'2021-01-{day % 28 + 1:02d},Portugal,{day},{day * 7}\n' for day in range(start, stop)).encode()
+
+
+CONTENT = b'date,location,total_cases,total_tests\n' + rows(0, 500)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serves `server.files` with strong ETags and, unless `server.honor_range` is False, Range requests."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        range_header = self.headers.get('Range')
+        if range_header and server.honor_range:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.files = {'/data.csv': CONTENT}
+    httpd.requests = []
+    httpd.honor_range = True
+    httpd.url = f'http://127.0.0.1:{httpd.server_port}/data.csv'
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(server, tmp_path):
+    """Fetch the served file, always revalidating the snapshot."""
+    return snapshot.fetch(server.url, cache_dir=tmp_path, max_age=0, retries=0)
+
+
+def test_first_fetch(server, tmp_path):
+    path = fetch(server, tmp_path)
+    assert path.read_bytes() == CONTENT
+    assert 'Range' not in server.requests[-1]
+    assert snapshot.appended_from(path) is None
+
+
+def test_not_modified(server, tmp_path):
+    path = fetch(server, tmp_path)
+    checked_at = snapshot.read_metadata(path)['checked_at']
+    assert fetch(server, tmp_path) == path
+    assert 'If-None-Match' in server.requests[-1]
+    assert path.read_bytes() == CONTENT
+    assert snapshot.read_metadata(path)['checked_at'] > checked_at
+
+
+def test_appended_tail(server, tmp_path):
+    path = fetch(server, tmp_path)
+    server.files['/data.csv'] = CONTENT + rows(500, 520)
+    fetch(server, tmp_path)
+    assert server.requests[-1]['Range'] == f'bytes={len(CONTENT) - snapshot.RANGE_OVERLAP}-'
+    assert len(server.requests) == 2
+    assert path.read_bytes() == CONTENT + rows(500, 520)
+    assert snapshot.appended_from(path) == len(CONTENT)
+
+
+def test_edited_overlap(server, tmp_path):
+    # An edit within the overlap shows in the bytes of the tail, the file is downloaded again
+    path = fetch(server, tmp_path)
+    edited = CONTENT[:-100] + CONTENT[-100:].replace(b'4', b'5') + rows(500, 520)
+    server.files['/data.csv'] = edited
+    fetch(server, tmp_path)
+    assert 'Range' in server.requests[1] and 'Range' not in server.requests[2]
+    assert path.read_bytes() == edited
+    assert snapshot.appended_from(path) is None
+
+
+def test_edited_in_place(server, tmp_path):
+    # A file that changed without growing cannot be an append
+    path = fetch(server, tmp_path)
+    edited = CONTENT.replace(b'Portugal', b'Portugai')
+    assert len(edited) == len(CONTENT)
+    server.files['/data.csv'] = edited
+    fetch(server, tmp_path)
+    assert 'Range' in server.requests[1] and 'Range' not in server.requests[2]
+    assert path.read_bytes() == edited
+    assert snapshot.appended_from(path) is None
+
+
+def test_shrunk(server, tmp_path):
+    path = fetch(server, tmp_path)
+    server.files['/data.csv'] = CONTENT[:len(CONTENT) // 4]
+    fetch(server, tmp_path)
+    assert 'Range' in server.requests[1] and 'Range' not in server.requests[2]
+    assert path.read_bytes() == CONTENT[:len(CONTENT) // 4]
+    assert snapshot.appended_from(path) is None
+
+
+def test_server_ignoring_range(server, tmp_path):
+    # The full file comes back with a 200, an append is still recognized by comparing it with the snapshot
+    server.honor_range = False
+    path = fetch(server, tmp_path)
+    server.files['/data.csv'] = CONTENT + rows(500, 520)
+    fetch(server, tmp_path)
+    assert len(server.requests) == 2
+    assert path.read_bytes() == CONTENT + rows(500, 520)
+    assert snapshot.appended_from(path) == len(CONTENT)
+
+
+def test_full_download_when_range_max_age_passed(server, tmp_path, monkeypatch):
+    fetch(server, tmp_path)
+    monkeypatch.setattr(snapshot, 'RANGE_MAX_AGE', 0)
+    server.files['/data.csv'] = CONTENT + rows(500, 520)
+    fetch(server, tmp_path)
+    assert 'Range' not in server.requests[-1]
+
+
+def test_range_requests_disabled(server, tmp_path):
+    # Sources that opt out of Range requests are downloaded in full, an append is still recognized
+    path = fetch(server, tmp_path)
+    server.files['/data.csv'] = CONTENT + rows(500, 520)
+    snapshot.fetch(server.url, cache_dir=tmp_path, max_age=0, use_range=False)
+    assert 'Range' not in server.requests[-1]
+    assert snapshot.appended_from(path) == len(CONTENT)
+
+
+def test_offline(server, tmp_path):
+    path = fetch(server, tmp_path)
+    server.shutdown()
+    server.server_close()
+    assert fetch(server, tmp_path) == path
+    assert path.read_bytes() == CONTENT
+
+
+def test_offline_without_snapshot(server, tmp_path):
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(requests.RequestException):
+        fetch(server, tmp_path)
+
+
+def test_fetch_all(server, tmp_path):
+    server.files['/other.csv'] = rows(0, 10)
+    other = server.url.replace('data.csv', 'other.csv')
+    sources = {'data': snapshot.Source(server.url, range_requests=False), 'other': snapshot.Source(other, retries=0)}
+    fetched = snapshot.fetch_all(sources, cache_dir=tmp_path, max_age=0)
+    server.files['/data.csv'] = CONTENT + rows(500, 520)
+    fetched = snapshot.fetch_all(sources, cache_dir=tmp_path, max_age=0)
+    assert not any('Range' in headers for headers in server.requests)
+    assert fetched['data'].path.read_bytes() == CONTENT + rows(500, 520)
+    assert fetched['other'].path.read_bytes() == rows(0, 10)
+    assert all(result.seconds >= 0 for result in fetched.values())
@@ -0,0 +1,122 @@
+"""
+transforms.py against the list comprehensions over `Series.iloc` it replaced in the graph callbacks. The transforms
+return series aligned with their input, NaN on the first days, so the old outputs are compared with the days the
+comprehensions computed. The only difference is that non-finite ratios (a growth from zero) are NaN instead of inf.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import transforms
+
+
+# A cumulative series with a flat start, a growth from zero and a drop
+SERIES = pd.Series([0, 0, 3, 3, 10, 4, 4, 12, 30, 30, 25, 60], dtype='int64')
+
+# Outputs of the removed comprehensions on SERIES
+FROZEN_PCT_CHANGE = [np.nan, np.inf, 0.0, 233.33333333333337, -60.0, 0.0, 200.0, 150.0, 0.0, -16.666666666666657,
+                     140.0]
+FROZEN_WEEKLY_DIFF = [12, 30, 27, 22, 50]
+FROZEN_WEEKLY_AVERAGE = [1.7142857142857142, 4.285714285714286, 3.857142857142857, 3.142857142857143,
+                         7.142857142857143]
+
+
+def old_lag_diff(source, time):
+    # update_graph_1_data
+    return [source[cases] - source[cases - time] for cases in range(time, len(source))]
+
+
+def old_average_change(data_y, time):
+    # update_graph_2_data, weekly
+    return [(data_y.iloc[cases] - data_y.iloc[cases - time]) / 7 for cases in range(time, len(data_y))]
+
+
+def old_pct_change(data_y):
+    # update_graph_2_data
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return [(data_y.iloc[cases] / data_y.iloc[cases - 1]) * 100 - 100 for cases in range(1, len(data_y))]
+
+
+def finite(values):
+    values = np.array(values, dtype='float64')
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def random_series(seed, length=400):
+    rng = np.random.default_rng(seed)
+    new = rng.poisson(rng.uniform(0, 50), length) * (rng.random(length) > 0.2)
+    return pd.Series(np.cumsum(new), dtype='int64')
+
+
+def test_frozen_outputs():
+    np.testing.assert_array_equal(transforms.lag_diff(SERIES, 7)[7:], FROZEN_WEEKLY_DIFF)
+    np.testing.assert_array_equal(transforms.lag_diff(SERIES, 7)[7:] / 7, FROZEN_WEEKLY_AVERAGE)
+    np.testing.assert_array_equal(transforms.pct_change(SERIES)[1:], finite(FROZEN_PCT_CHANGE))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('lag', [1, 7, 14])
+def test_lag_diff(seed, lag):
+    series = random_series(seed)
+    result = transforms.lag_diff(series, lag)
+    assert result.shape == series.shape
+    assert np.isnan(result[:lag]).all()
+    np.testing.assert_array_equal(result[lag:], old_lag_diff(series, lag))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_average_change(seed):
+    series = random_series(seed)
+    np.testing.assert_array_equal(transforms.lag_diff(series, 7)[7:] / 7, old_average_change(series, 7))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pct_change(seed):
+    series = random_series(seed)
+    result = transforms.pct_change(series)
+    assert np.isnan(result[0])
+    np.testing.assert_array_equal(result[1:], finite(old_pct_change(series)))
+
+
+def test_pct_change_of_average_change():
+    # The weekly increments of graph_2 are the percentage change of the average change
+    average = pd.Series(old_average_change(SERIES, 7))
+    result = transforms.pct_change(transforms.lag_diff(SERIES, 7) / 7)
+    np.testing.assert_array_equal(result[8:], finite(old_pct_change(average)))
+
+
+def test_pct_change_non_finite():
+    result = transforms.pct_change([0, 0, 5, 0, np.nan, 2])
+    np.testing.assert_array_equal(result, [np.nan, np.nan, np.nan, -100, np.nan, np.nan])
+
+
+def old_nan_rolling_mean(values, window):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return [np.nanmean(values[max(i - window + 1, 0):i + 1]) for i in range(len(values))]
+
+
+@pytest.mark.parametrize('window', [1, 7, 14])
+def test_nan_rolling_mean(window):
+    rng = np.random.default_rng(window)
+    values = rng.uniform(0, 100, 200)
+    values[rng.random(200) < 0.2] = np.nan
+    values[50:70] = np.nan
+    result = transforms.nan_rolling_mean(values, window)
+    np.testing.assert_allclose(result, old_nan_rolling_mean(values, window), rtol=1e-12)
+    np.testing.assert_allclose(result, pd.Series(values).rolling(window, min_periods=1).mean(), rtol=1e-12)
+
+
+def test_nan_rolling_mean_matrix():
+    rng = np.random.default_rng(0)
+    matrix = rng.uniform(0, 10, (4, 60))
+    matrix[1, :30] = np.nan
+    matrix[2] = np.nan
+    result = transforms.nan_rolling_mean(matrix, 7)
+    assert result.shape == matrix.shape
+    for row, values in zip(result, matrix):
+        np.testing.assert_allclose(row, old_nan_rolling_mean(values, 7), rtol=1e-12)
+    assert np.isnan(result[2]).all()
+    assert np.isnan(result[1, :30]).all() and not np.isnan(result[1, 30:]).any()
@@ -0,0 +1,49 @@
+"""
+Vectorized transforms over daily series ordered by date, used to derive the metrics of every snapshot.
+Every function takes a single series or a matrix with a series per row and returns a float64 array of the same shape,
+aligned with its input day by day and NaN on the days where the value is not defined.
+"""
+import numpy as np
+
+
+def lagged(values, lag):
+    """values[..., i - lag] for every i along the last axis, NaN for the first `lag` days."""
+    values = np.asarray(values, dtype='float64')
+    shifted = np.full_like(values, np.nan)
+    shifted[..., lag:] = values[..., :values.shape[-1] - lag]
+    return shifted
+
+
+def lag_diff(values, lag):
+    """values[i] - values[i - lag] for every i."""
+    return np.asarray(values, dtype='float64') - lagged(values, lag)
+
+
+def ratio(numerator, denominator):
+    """numerator / denominator, NaN where it is not finite."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.asarray(numerator, dtype='float64') / denominator
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def pct_change(values):
+    """Percentage increment (values[i] / values[i - 1]) * 100 - 100 for every i."""
+    return ratio(values, lagged(values, 1)) * 100 - 100
+
+
+def nan_rolling_mean(values, window):
+    """
+    Mean of the non-NaN values of values[..., i - window + 1:i + 1] along the last axis for every i, over the days
+    available at the start, NaN where the window has no values.
+    """
+    values = np.asarray(values, dtype='float64')
+    valid = ~np.isnan(values)
+    totals = np.cumsum(np.where(valid, values, 0), axis=-1)
+    counts = np.cumsum(valid, axis=-1)
+    # Running sums minus the ones from `window` days before, the first days keep their running sums
+    sums, days = totals.copy(), counts.copy()
+    sums[..., window:] -= totals[..., :-window]
+    days[..., window:] -= counts[..., :-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / days
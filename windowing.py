@@ -0,0 +1,93 @@
+"""
+Date-range windowing of the Portugal graphs.
+The series plotted by graph_1 and graph_2 are taken once per snapshot by `build` from the derived metrics, over their
+whole date range, one per data source and time frame. A request only turns its time window into a date range and
+slices the precomputed arrays with two binary searches on their sorted dates, so any window costs O(log n) whatever
+its length.
+"""
+import numpy as np
+
+
+# Days up to the last date covered by the preset time windows, None covers every date
+PRESETS = {
+    'All Data': None,
+    'Last 120 days': 120,
+    'Last 90 days': 90,
+    'Last 60 days': 60,
+    'Last 30 days': 30,
+    'Last 15 days': 15,
+    'Last 7 days': 7
+}
+# Time window of the dates picked in the date range picker
+CUSTOM = 'Custom Range'
+
+# Days over which every time frame counts the new cases
+PERIODS = {'Weekly': 7, 'Daily': 1}
+
+
+class Series:
+    """Arrays aligned on the sorted `dates`, sliced together by date range."""
+    __slots__ = ('dates', 'columns')
+
+    def __init__(self, dates, **columns):
+        self.dates = dates
+        self.columns = columns
+
+    def between(self, start=None, end=None):
+        """Dates and columns from `start` to `end`, both included, an open bound when None."""
+        first = 0 if start is None else np.searchsorted(self.dates, start, side='left')
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, end, side='right')
+        return self.dates[first:last], {name: values[first:last] for name, values in self.columns.items()}
+
+
+def parse_date(value):
+    """datetime64[D] of a date picker value ('YYYY-MM-DD' and maybe a time), None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        return np.datetime64(str(value)[:10], 'D')
+    except ValueError:
+        return None
+
+
+def date_range(dates, time_window, start_date=None, end_date=None):
+    """(start, end) dates of `time_window`, ending on the last of `dates`, or of the picked range when it is CUSTOM."""
+    if time_window == CUSTOM:
+        return parse_date(start_date), parse_date(end_date)
+    days = PRESETS.get(time_window)
+    if days is None:
+        return None, None
+    return dates[-1] - np.timedelta64(days - 1, 'D'), None
+
+
+def first_positive(values):
+    positive = np.flatnonzero(values > 0)
+    return positive[0] if len(positive) else len(values)
+
+
+def increments(dates, values, growth):
+    """
+    `values` and their percentage increment from the previous day (`growth`), from the day after the first positive
+    value. The increments from zero are undefined, so the series starts where the first one can be computed.
+    """
+    first = first_positive(values) + 1
+    return Series(dates[first:], value=values[first:], increase=growth[first:])
+
+
+def build(dates, series, derived):
+    """Series of the graphs, keyed by (graph, data source, time frame), read from the `derived` metrics."""
+    windows = {}
+    for data_source, source in series.items():
+        for time_frame, period in PERIODS.items():
+            # New cases in the period as a function of the total number of cases
+            new = derived[data_source, 'new' if period == 1 else f'new_{period}'][period:]
+            windows['graph_1', data_source, time_frame] = Series(
+                dates[period:], total=source[period:], new=new.astype(source.dtype))
+            # The cumulative counts day by day, the average new cases per day over a longer period
+            if period == 1:
+                windows['graph_2', data_source, time_frame] = increments(
+                    dates, source, derived[data_source, 'growth'])
+            else:
+                windows['graph_2', data_source, time_frame] = increments(
+                    dates, derived[data_source, f'mean_{period}'], derived[data_source, f'mean_{period}_growth'])
+    return windows